@@ -0,0 +1,78 @@
+"""
+Compare GeoJSON station ingestion paths.
+
+Times `GeoDataFrame.from_features` against `ingest.features_to_geodataframe`
+on synthetic station catalogs, checks that both produce the same frame and
+reports JSON decoding time with the standard library and with orjson.
+
+Usage:
+    python benchmarks/bench_ingest.py --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import geopandas as gpd
+from geopandas.testing import assert_geodataframe_equal
+
+import ingest
+
+POLLUTANTS = ["pm10", "pm25", "no2", "so2", "o3", "co"]
+COUNTRIES = ["IN", "PH", "TH", "MY", "ID", "JP", "KR", "CN", "VN", "LK"]
+
+
+def make_features(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [rng.uniform(-180, 180), rng.uniform(-90, 90)]},
+            "properties": {
+                "id": f"station-{i}",
+                "name": f"Station {i}",
+                "city_name": f"City {rng.randrange(500)}",
+                "country_id": rng.choice(COUNTRIES),
+                "pollutants": rng.sample(POLLUTANTS, rng.randint(1, len(POLLUTANTS))),
+            },
+        }
+        for i in range(n)
+    ]
+
+
+def best_of(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'features':>10} {'json':>8} {'orjson':>8} {'from_features':>14} {'vectorized':>11} {'speedup':>8}")
+    for n in args.sizes:
+        features = make_features(n)
+        body = json.dumps({"type": "FeatureCollection", "features": features}).encode()
+
+        t_json, _ = best_of(lambda: json.loads(body), args.repeat)
+        t_orjson = best_of(lambda: ingest.orjson.loads(body), args.repeat)[0] if ingest.orjson else float("nan")
+        t_reference, reference = best_of(lambda: gpd.GeoDataFrame.from_features(features), args.repeat)
+        t_fast, fast = best_of(lambda: ingest.features_to_geodataframe(features), args.repeat)
+
+        assert_geodataframe_equal(fast, reference)
+        print(f"{n:>10} {t_json:>8.3f} {t_orjson:>8.3f} {t_reference:>14.3f} {t_fast:>11.3f} {t_reference / t_fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
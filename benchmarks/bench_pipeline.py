@@ -0,0 +1,284 @@
+"""
+Time and measure the dashboard's data pipeline end to end, offline.
+
+Each catalog size gets its own local stub of the API (see stub_api.py) and
+a fresh cache directory. The stages are then run the way the dashboard
+runs them:
+
+    catalog_fetch        load_data with an empty cache (API, parsing, shards)
+    catalog_cached       load_data from the on-disk shards
+    station_index        spatial index behind the interactive map
+    density_grid         density overview of large networks
+    coverage_aggregation tab2/tab3 country and pollutant aggregations
+    map_build            tab1 station map
+    map_html             tab1 map rendered to HTML
+    series_fetch         time series download, storage and rollups
+    series_cached        time series served from the measurement store
+    series_shared        time series served from the in-memory shared cache
+    plot_time_series     tab4 figures
+    aqi, quality         tab4 AQI and data quality summaries
+    export_<format>      add_export_section serializers
+
+Every stage is timed (best of --repeat) and then run once more under
+tracemalloc for its peak memory; results go to a JSON file that can be
+passed back as --baseline to a later run to spot regressions.
+
+Usage:
+    python benchmarks/bench_pipeline.py --stations 1000 10000 100000 --days 30 365
+    python benchmarks/bench_pipeline.py --stations 1000000 --days 1095 --baseline before.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# The settings are read on import, so the API and cache locations must be
+# pointed at the stub and a scratch directory before any dashboard module loads
+PORT = free_port()
+os.environ["AQ_API_BASE_URL"] = f"http://127.0.0.1:{PORT}"
+SCRATCH_CACHE = "AQ_CACHE_DIR" not in os.environ
+if SCRATCH_CACHE:
+    os.environ["AQ_CACHE_DIR"] = tempfile.mkdtemp(prefix="aq-bench-")
+
+import numpy as np
+import pandas as pd
+
+from stub_api import StubServer
+from analysis import pollutant_coverage, country_distribution, pollutant_distribution
+from aqi import compute_aqi
+from catalog import get_pollutant_info, get_regions, get_country_codes, load_catalog
+from data_export import EXPORT_FORMATS
+from density_grid import build_density_grid
+from map_layers import build_station_map, render_map_html
+from pollutant_index import mask_codes
+from quality import scan_quality
+from settings import CACHE_DIR
+from shared_cache import get_shared_cache
+from spatial_index import StationIndex
+from series_loader import fetch_many_historical, stack_series
+from time_series import plot_time_series
+
+SELECTED_POLLUTANTS = ["pm10", "pm25"]
+
+
+def clear_cache():
+    get_shared_cache().clear()
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+
+def measure(func, repeat, setup=None, memory=True):
+    """
+    Best-of-`repeat` wall time of `func` and the peak memory it allocates.
+
+    `setup` runs untimed before every call, e.g. to empty the caches of a cold stage.
+
+    Returns:
+        tuple: (seconds, peak MiB or None, result of the last timed call)
+    """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+
+    peak = None
+    if memory:
+        if setup:
+            setup()
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return min(timings), peak, result
+
+
+class Recorder:
+    def __init__(self, repeat, memory):
+        self.repeat = repeat
+        self.memory = memory
+        self.results = []
+
+    def run(self, stage, func, setup=None, **params):
+        seconds, peak, result = measure(func, self.repeat, setup, self.memory)
+        record = {"stage": stage, **params, "seconds": round(seconds, 4),
+                  "peak_mb": None if peak is None else round(peak, 1)}
+        self.results.append(record)
+        scope = " ".join(f"{key}={value}" for key, value in params.items())
+        memory = "" if peak is None else f" {peak:>9.1f} MiB"
+        print(f"{stage:<22} {scope:<28} {seconds:>9.3f} s{memory}", flush=True)
+        return result
+
+
+def bench_catalog(recorder, n, countries):
+    pollutant_info = get_pollutant_info()
+    country_names = get_country_codes()
+    codes = list(pollutant_info.keys())
+
+    recorder.run("catalog_fetch", lambda: load_catalog(countries), setup=clear_cache, stations=n)
+    stations_gdf, failed = recorder.run("catalog_cached", lambda: load_catalog(countries), stations=n)
+    if failed:
+        raise RuntimeError(f"Stub API failed for {sorted(failed)}")
+
+    recorder.run("station_index", lambda: StationIndex(stations_gdf), stations=n)
+    density_grid = recorder.run("density_grid", lambda: build_density_grid(stations_gdf), stations=n)
+
+    def aggregate():
+        selected = pollutant_coverage(stations_gdf, SELECTED_POLLUTANTS, codes)
+        return (int(selected.sum()), country_distribution(stations_gdf, country_names),
+                pollutant_distribution(stations_gdf, pollutant_info, country_names))
+
+    recorder.run("coverage_aggregation", aggregate, stations=n)
+
+    def build_map():
+        measures_selected = pollutant_coverage(stations_gdf, SELECTED_POLLUTANTS, codes)
+        return build_station_map(stations_gdf[measures_selected], SELECTED_POLLUTANTS, pollutant_info,
+                                 country_names, density_grid=density_grid)
+
+    recorder.run("map_build", build_map, stations=n)
+    # Rendering mutates the map, so every run renders a freshly built one
+    maps = []
+    recorder.run("map_html", lambda: render_map_html(maps.pop()), setup=lambda: maps.append(build_map()), stations=n)
+    return stations_gdf
+
+
+def pick_series(stations_gdf, count):
+    codes = list(get_pollutant_info().keys())
+    stations = stations_gdf.sort_values("id").head(count)
+    return [(station_id, mask_codes(mask, codes)[0])
+            for station_id, mask in zip(stations["id"], stations["pollutant_mask"])]
+
+
+def bench_series(recorder, series, days):
+    pollutant_info = get_pollutant_info()
+    params = {"series": len(series), "days": days}
+
+    def load():
+        frames, errors = fetch_many_historical(series, days=days, level="hourly")
+        if errors:
+            raise RuntimeError(f"Stub API failed: {next(iter(errors.values()))}")
+        return frames
+
+    recorder.run("series_fetch", load, setup=clear_cache, **params)
+    recorder.run("series_cached", load, setup=get_shared_cache().clear, **params)
+    frames = recorder.run("series_shared", load, **params)
+
+    recorder.run("plot_time_series", lambda: [
+        plot_time_series(df.assign(pollutant=pollutant, station_name=station_id), pollutant_info)
+        for (station_id, pollutant), df in frames.items()
+    ], **params)
+
+    measurements = stack_series(frames)
+    recorder.run("aqi", lambda: compute_aqi(measurements), **params)
+    end = measurements.index.max()
+    recorder.run("quality", lambda: scan_quality(measurements, end - pd.Timedelta(days=days), end), **params)
+
+    table = measurements.reset_index()
+    for export_format, export in EXPORT_FORMATS.items():
+        recorder.run(f"export_{export_format}", lambda: export["serializer"](table), **params)
+
+
+def environment():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    import geopandas
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "geopandas": geopandas.__version__,
+    }
+
+
+def compare(results, baseline_path):
+    """Print each stage's time and memory relative to a previous run."""
+    baseline = json.loads(Path(baseline_path).read_text())
+    scope_keys = ("stage", "stations", "series", "days")
+    previous = {tuple(r.get(key) for key in scope_keys): r for r in baseline["results"]}
+    print(f"\nCompared with {baseline_path} ({baseline['environment'].get('revision')}):")
+    for record in results:
+        old = previous.get(tuple(record.get(key) for key in scope_keys))
+        if not old:
+            continue
+        scope = " ".join(f"{key}={record[key]}" for key in scope_keys[1:] if key in record)
+        time_ratio = record["seconds"] / old["seconds"] if old["seconds"] else float("nan")
+        memory = ""
+        if record["peak_mb"] is not None and old.get("peak_mb"):
+            memory = f" memory {record['peak_mb'] / old['peak_mb']:>5.2f}x"
+        print(f"{record['stage']:<22} {scope:<28} time {time_ratio:>5.2f}x{memory}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="Synthetic catalog sizes")
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 365], help="Time series windows")
+    parser.add_argument("--series", type=int, default=8, help="Station/pollutant series loaded per window")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Skip the tracemalloc runs (they are slow on the largest catalogs)")
+    parser.add_argument("--out", default="benchmark_results.json", help="JSON file to write")
+    parser.add_argument("--baseline", help="Previous results file to compare with")
+    args = parser.parse_args()
+
+    countries = [code for codes in get_regions().values() for code in codes]
+    recorder = Recorder(args.repeat, not args.no_memory)
+    print(f"{'stage':<22} {'scope':<28} {'time':>11} {'' if args.no_memory else 'peak memory':>13}")
+
+    stations_gdf = None
+    try:
+        for n in sorted(args.stations):
+            with StubServer(n, args.seed, PORT):
+                catalog = bench_catalog(recorder, n, countries)
+                if stations_gdf is None:
+                    stations_gdf = catalog
+
+        # Series do not depend on the catalog size; the smallest catalog is enough
+        if args.series > 0 and args.days:
+            series = pick_series(stations_gdf, args.series)
+            with StubServer(min(args.stations), args.seed, PORT):
+                for days in sorted(args.days):
+                    bench_series(recorder, series, days)
+    finally:
+        if SCRATCH_CACHE:
+            shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    report = {"environment": environment(), "parameters": vars(args), "results": recorder.results}
+    Path(args.out).write_text(json.dumps(report, indent=2))
+    print(f"\nWrote {args.out}")
+    if args.baseline:
+        compare(recorder.results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Measure dashboard cold start and rerun times, offline.
+
+Import time is measured in fresh interpreters: streamlit alone, then the
+dashboard module on top of it, with the heavy libraries it pulled in.
+Reruns are measured with Streamlit's AppTest against a local stub of the
+API (see stub_api.py), in a fresh process whose station cache was warmed
+by an earlier run:
+
+    first_run    first script run, including imports and the catalog load
+    rerun        rerun of the default tab with nothing changed
+    tab_open     first switch to another tab
+    tab_rerun    rerun of that tab with nothing changed
+
+Results go to a JSON file that can be passed back as --baseline.
+
+Usage:
+    python benchmarks/bench_startup.py --stations 10000 --out startup.json
+    python benchmarks/bench_startup.py --baseline startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SRC = ROOT / "src"
+
+HEAVY_MODULES = ["geopandas", "shapely", "folium", "streamlit_folium", "plotly.express", "xlsxwriter", "time_series"]
+
+TABS = ["Network Overview", "Station Distribution", "Pollutant Analysis", "Time Series Analysis"]
+
+IMPORT_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {src!r})
+start = time.perf_counter()
+import streamlit
+streamlit_seconds = time.perf_counter() - start
+start = time.perf_counter()
+import dashboard
+print(json.dumps({{
+    "streamlit": streamlit_seconds,
+    "dashboard": time.perf_counter() - start,
+    "loaded": [name for name in {heavy!r} if name in sys.modules]
+}}))
+"""
+
+
+def measure_imports(repeat):
+    """Best-of-`repeat` import times of streamlit and of the dashboard on top of it."""
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT.format(src=str(SRC), heavy=HEAVY_MODULES)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return [
+        {"stage": "import_streamlit", "seconds": round(min(r["streamlit"] for r in runs), 4)},
+        {"stage": "import_dashboard", "seconds": round(min(r["dashboard"] for r in runs), 4),
+         "loaded": runs[-1]["loaded"]},
+    ]
+
+
+def run_app(timeout):
+    """
+    Child process: time AppTest runs of the dashboard and print them as JSON.
+
+    Runs in its own interpreter so the first run pays the real import cost.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    sys.path.insert(0, str(SRC))
+    app = AppTest.from_file(str(SRC / "main.py"), default_timeout=timeout)
+    results = []
+
+    def timed(stage, tab):
+        start = time.perf_counter()
+        app.run()
+        seconds = time.perf_counter() - start
+        if app.exception:
+            raise RuntimeError(f"{stage} on {tab}: {app.exception[0].value}")
+        results.append({"stage": stage, "tab": tab, "seconds": round(seconds, 4)})
+
+    timed("first_run", TABS[0])
+    timed("rerun", TABS[0])
+    for tab in TABS[1:]:
+        app.session_state["dashboard_tab"] = tab
+        timed("tab_open", tab)
+        timed("tab_rerun", tab)
+    print(json.dumps(results))
+
+
+def measure_reruns(stations, seed, repeat, timeout):
+    """Best-of-`repeat` AppTest timings, each repetition in a fresh process."""
+    from stub_api import StubServer
+
+    with StubServer(stations, seed) as stub, tempfile.TemporaryDirectory(prefix="aq-startup-") as cache_dir:
+        env = dict(os.environ, AQ_API_BASE_URL=stub.url, AQ_CACHE_DIR=cache_dir)
+        command = [sys.executable, __file__, "--child", "--timeout", str(timeout)]
+        # The first run only fills the on-disk caches
+        runs = []
+        for _ in range(repeat + 1):
+            output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+    best = {}
+    for run in runs[1:]:
+        for record in run:
+            key = (record["stage"], record["tab"])
+            if key not in best or record["seconds"] < best[key]["seconds"]:
+                best[key] = record
+    return list(best.values())
+
+
+def compare(results, baseline_path):
+    """Print each measurement relative to a previous run."""
+    baseline = json.loads(Path(baseline_path).read_text())
+    previous = {(r["stage"], r.get("tab")): r for r in baseline["results"]}
+    print(f"\nCompared with {baseline_path}:")
+    for record in results:
+        old = previous.get((record["stage"], record.get("tab")))
+        if old and old["seconds"]:
+            print(f"{record['stage']:<18} {record.get('tab') or '':<22} {record['seconds'] / old['seconds']:>5.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, default=10_000, help="Synthetic catalog size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds allowed per app run")
+    parser.add_argument("--out", default="startup_results.json", help="JSON file to write")
+    parser.add_argument("--baseline", help="Previous results file to compare with")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_app(args.timeout)
+        return
+
+    results = measure_imports(args.repeat) + measure_reruns(args.stations, args.seed, args.repeat, args.timeout)
+    for record in results:
+        loaded = f"  loads {', '.join(record['loaded'])}" if record.get("loaded") else ""
+        print(f"{record['stage']:<18} {record.get('tab') or '':<22} {record['seconds']:>8.3f} s{loaded}")
+
+    report = {"parameters": vars(args), "results": results}
+    Path(args.out).write_text(json.dumps(report, indent=2))
+    print(f"\nWrote {args.out}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Local stand-in for the Energy and Clean Air API, serving seeded synthetic data.
+
+Serves the endpoints the dashboard uses:
+
+    /stations?format=geojson&country=IN,JP
+    /measurements?station_id=...&pollutant=...&start_date=...&end_date=...&limit=...
+    /stations/<station_id>/measurements?pollutant=...&start_date=...&end_date=...&limit=...
+
+The catalog is generated from `--stations` and `--seed`, with stations
+spread over the countries of `catalog.get_regions()`. Hourly measurements
+are a deterministic function of station, pollutant and timestamp, so the
+same hour has the same value whichever request range it is fetched with.
+
+Usage:
+    python benchmarks/stub_api.py --stations 100000 --port 8765
+    AQ_API_BASE_URL=http://127.0.0.1:8765 streamlit run src/main.py
+"""
+import argparse
+import json
+import multiprocessing
+import sys
+import zlib
+from datetime import date, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from catalog import get_pollutant_info, get_regions
+
+POLLUTANTS = list(get_pollutant_info().keys())
+COUNTRIES = [code for codes in get_regions().values() for code in codes]
+
+# Typical level and daily swing of each pollutant, in get_pollutant_info() units
+BASELINES = {"pm10": (40, 15), "pm25": (20, 8), "no2": (25, 12), "so2": (5, 3), "o3": (35, 20), "co": (0.6, 0.3)}
+
+
+def make_catalog(n, seed=0):
+    """
+    Generate `n` stations as GeoJSON features, grouped by country.
+
+    Returns:
+        dict: ISO country code to list of GeoJSON feature dicts
+    """
+    rng = np.random.default_rng(seed)
+    countries = rng.integers(len(COUNTRIES), size=n)
+    lons = rng.uniform(-180, 180, size=n)
+    lats = rng.uniform(-60, 70, size=n)
+    cities = rng.integers(max(n // 20, 1), size=n)
+    # At least one pollutant per station, PM more often than gases
+    measured = rng.random((n, len(POLLUTANTS))) < [0.8, 0.7, 0.5, 0.3, 0.4, 0.2]
+    measured[np.arange(n), rng.integers(len(POLLUTANTS), size=n)] = True
+
+    by_country = {code: [] for code in COUNTRIES}
+    for i in range(n):
+        country = COUNTRIES[countries[i]]
+        by_country[country].append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [float(lons[i]), float(lats[i])]},
+            "properties": {
+                "id": f"{country.lower()}-{i:07d}",
+                "name": f"Station {i}",
+                "city_name": f"{country} City {cities[i]}",
+                "country_id": country,
+                "pollutants": [p for p, on in zip(POLLUTANTS, measured[i]) if on],
+            },
+        })
+    return by_country
+
+
+def make_series(station_id, pollutant, start, hours, seed=0):
+    """
+    Synthetic hourly concentrations: a daily cycle plus hashed noise.
+
+    Args:
+        station_id (str): Station the series belongs to
+        pollutant (str): Pollutant code
+        start (datetime.date): Day of the first hour
+        hours (int): Number of hourly values
+        seed (int): Seed mixed into every station's series
+
+    Returns:
+        numpy.ndarray: `hours` values, rounded to two decimals
+    """
+    key = zlib.crc32(f"{seed}:{station_id}:{pollutant}".encode())
+    level, swing = BASELINES.get(pollutant, (10, 5))
+    # Hours since the epoch, so values do not depend on the requested range
+    t = (start - date(1970, 1, 1)).days * 24 + np.arange(hours, dtype=np.float64)
+    noise = np.modf(np.abs(np.sin(t * 12.9898 + key % 1000) * 43758.5453))[0] - 0.5
+    values = level * (1 + 0.2 * np.sin(t / (24 * 365) * 2 * np.pi + key % 7)) + swing * np.sin(t / 24 * 2 * np.pi) + swing * noise
+    return np.round(np.maximum(values, 0), 2)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Set by `serve`: country code to encoded GeoJSON features
+    encoded_features = {}
+    seed = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, body, status=200):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        parts = url.path.strip("/").split("/")
+        try:
+            if parts == ["stations"]:
+                self._send_json(self._stations(params))
+            elif parts == ["measurements"]:
+                self._send_json(self._measurements(params["station_id"], params))
+            elif len(parts) == 3 and parts[0] == "stations" and parts[2] == "measurements":
+                self._send_json(self._measurements(parts[1], params))
+            else:
+                self._send_json(b'{"error": "not found"}', status=404)
+        except (KeyError, ValueError) as e:
+            self._send_json(json.dumps({"error": str(e)}).encode(), status=400)
+
+    def _stations(self, params):
+        countries = params["country"].split(",") if params.get("country") else list(self.encoded_features)
+        chunks = [self.encoded_features[c] for c in countries if self.encoded_features.get(c)]
+        return b'{"type": "FeatureCollection", "features": [' + b",".join(chunks) + b"]}"
+
+    def _measurements(self, station_id, params):
+        pollutant = params["pollutant"]
+        start = date.fromisoformat(params["start_date"])
+        end = date.fromisoformat(params["end_date"])
+        hours = ((end - start).days + 1) * 24
+        limit = min(int(params.get("limit", hours)), hours)
+        values = make_series(station_id, pollutant, start, limit, self.seed)
+        first = np.datetime64(start, "h")
+        timestamps = np.datetime_as_string(first + np.arange(limit), unit="s")
+        results = [
+            {"datetime": f"{ts}Z", "value": float(value), "pollutant": pollutant, "station_name": station_id}
+            for ts, value in zip(timestamps, values)
+        ]
+        return json.dumps({"results": results}).encode()
+
+
+def serve(n_stations, seed=0, host="127.0.0.1", port=0, ready=None):
+    """
+    Generate a catalog and serve it until the process is stopped.
+
+    Args:
+        n_stations (int): Stations in the synthetic catalog
+        seed (int): Seed of the catalog and measurements
+        host (str): Interface to bind
+        port (int): Port to bind, 0 for any free port
+        ready (multiprocessing.Queue): Receives the bound port once serving
+    """
+    StubHandler.encoded_features = {
+        country: ",".join(json.dumps(feature) for feature in features).encode()
+        for country, features in make_catalog(n_stations, seed).items()
+    }
+    StubHandler.seed = seed
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    if ready is not None:
+        ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+class StubServer:
+    """
+    Run `serve` in a child process for the duration of a `with` block.
+
+    The child competes neither for the GIL nor for memory traced by the caller.
+    """
+
+    def __init__(self, n_stations, seed=0, port=0, host="127.0.0.1"):
+        context = multiprocessing.get_context("spawn")
+        ready = context.Queue()
+        self.process = context.Process(target=serve, args=(n_stations, seed, host, port, ready), daemon=True)
+        self.process.start()
+        self.port = ready.get(timeout=600)
+        self.url = f"http://{host}:{self.port}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"Serving {args.stations} synthetic stations on http://{args.host}:{args.port}")
+    serve(args.stations, args.seed, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
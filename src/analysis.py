@@ -0,0 +1,65 @@
+import pandas as pd
+
+from pollutant_index import pollutant_bits, has_any, pollutant_matrix
+
+
+def pollutant_coverage(stations_gdf, selected_pollutants, pollutant_codes):
+    """
+    Stations measuring at least one of the selected pollutants.
+
+    Args:
+        stations_gdf (geopandas.GeoDataFrame): Catalog with a pollutant_mask column
+        selected_pollutants (list): Pollutant codes of interest
+        pollutant_codes (list): All pollutant codes, in bit order
+
+    Returns:
+        pandas.Series: Boolean mask aligned with `stations_gdf`
+    """
+    return has_any(stations_gdf['pollutant_mask'], pollutant_bits(selected_pollutants, pollutant_codes))
+
+
+def country_distribution(stations_gdf, country_names):
+    """
+    Station counts per country, for countries with a display name.
+
+    Returns:
+        pandas.DataFrame: Country and Station Count columns, largest first
+    """
+    country_data = stations_gdf['country_id'].astype(object).value_counts().reset_index()
+    country_data.columns = ['Country', 'Station Count']
+    country_data['Country'] = country_data['Country'].map(country_names)
+    return country_data.dropna(subset=['Country'])
+
+
+def city_distribution(stations_gdf, country_code):
+    """
+    Station counts per city of one country.
+
+    Returns:
+        pandas.DataFrame: City and Station Count columns
+    """
+    city_data = stations_gdf[stations_gdf['country_id'] == country_code]
+    city_data = city_data[city_data['city_name'].notna()]
+    city_counts = city_data.groupby('city_name', observed=True).size().reset_index()
+    city_counts.columns = ['City', 'Station Count']
+    return city_counts
+
+
+def pollutant_distribution(stations_gdf, pollutant_info, country_names):
+    """
+    Stations per country and pollutant, straight from the bitmask index.
+
+    Returns:
+        pandas.DataFrame: Country, Pollutant (display name) and Station Count
+        columns, without zero counts
+    """
+    pollutant_matrix_df = pollutant_matrix(stations_gdf['pollutant_mask'], list(pollutant_info.keys()))
+    country_ids = stations_gdf['country_id'].astype(object)
+    countries = country_ids.map(country_names).fillna(country_ids)
+    pollutant_df = (
+        pollutant_matrix_df.groupby(countries.rename('Country')).sum()
+        .rename(columns={code: info['name'] for code, info in pollutant_info.items()})
+        .melt(ignore_index=False, var_name='Pollutant', value_name='Station Count')
+        .reset_index()
+    )
+    return pollutant_df[pollutant_df['Station Count'] > 0].reset_index(drop=True)
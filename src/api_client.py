@@ -0,0 +1,245 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from instrumentation import http_hook, record_http, in_context
+from settings import (
+    HTTP_RETRIES, HTTP_BACKOFF_FACTOR, STATION_FETCH_WORKERS, MEASUREMENT_FETCH_WORKERS,
+    MEASUREMENT_TIMEOUT, MEASUREMENT_HEDGE_DELAY, CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_SECONDS, CIRCUIT_MAX_RESET_SECONDS
+)
+
+_session = None
+_session_lock = threading.Lock()
+
+_measurement_client = None
+_measurement_client_lock = threading.Lock()
+
+# Measurement requests in flight at once: every series loaded in parallel
+# downloads its chunks in parallel, and each chunk may race two endpoints
+MEASUREMENT_CONCURRENCY = 2 * MEASUREMENT_FETCH_WORKERS ** 2
+
+
+def create_session(pool_size=max(STATION_FETCH_WORKERS, MEASUREMENT_FETCH_WORKERS), retries=HTTP_RETRIES, backoff_factor=HTTP_BACKOFF_FACTOR,
+                   name=None):
+    """
+    Create a keep-alive HTTP session with connection pooling and retries.
+
+    Args:
+        pool_size (int): Maximum number of pooled connections per host
+        retries (int): Retries per request on connection errors, read
+            timeouts and retryable status codes
+        backoff_factor (float): Exponential backoff factor between retries
+        name (str): Client name under which the instrumentation records
+            every response's latency and size; None records nothing
+
+    Returns:
+        requests.Session: Configured session
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if name:
+        session.hooks["response"].append(http_hook(name))
+    return session
+
+
+def get_session():
+    """
+    Return the process-wide pooled session, creating it on first use.
+
+    Returns:
+        requests.Session: Shared session, safe to use from worker threads
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session(name="stations")
+    return _session
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised when every endpoint of a request is known to be down."""
+
+
+class CircuitBreaker:
+    """
+    Track endpoint health across requests.
+
+    An endpoint's circuit opens after `failure_threshold` consecutive
+    failures and requests skip it. Once the cool-down has passed a single
+    probe request is let through: success closes the circuit, failure
+    reopens it with a doubled cool-down (up to `max_reset_seconds`).
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_seconds=CIRCUIT_RESET_SECONDS,
+                 max_reset_seconds=CIRCUIT_MAX_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.max_reset_seconds = max_reset_seconds
+        self._lock = threading.Lock()
+        self._failures = {}
+        self._opened_at = {}
+        self._cooldown = {}
+        self._probing = set()
+
+    def allow(self, name):
+        """Whether a request may be sent to `name` now; claims the probe of a cooled-down circuit."""
+        with self._lock:
+            opened_at = self._opened_at.get(name)
+            if opened_at is None:
+                return True
+            if name in self._probing or time.monotonic() - opened_at < self._cooldown[name]:
+                return False
+            self._probing.add(name)
+            return True
+
+    def record_success(self, name):
+        with self._lock:
+            self._failures.pop(name, None)
+            self._opened_at.pop(name, None)
+            self._cooldown.pop(name, None)
+            self._probing.discard(name)
+
+    def record_failure(self, name):
+        with self._lock:
+            self._failures[name] = self._failures.get(name, 0) + 1
+            if name in self._probing:
+                self._probing.discard(name)
+                self._cooldown[name] = min(self._cooldown[name] * 2, self.max_reset_seconds)
+                self._opened_at[name] = time.monotonic()
+            elif name not in self._opened_at and self._failures[name] >= self.failure_threshold:
+                self._cooldown[name] = self.reset_seconds
+                self._opened_at[name] = time.monotonic()
+
+    def order(self, names):
+        """`names` ordered by consecutive failures, healthy endpoints first."""
+        with self._lock:
+            return sorted(names, key=lambda name: self._failures.get(name, 0))
+
+    def state(self):
+        """Mapping of every endpoint that has failed to "open", "half-open" or "closed"."""
+        with self._lock:
+            return {
+                name: "half-open" if name in self._probing else "open" if name in self._opened_at else "closed"
+                for name in self._failures
+            }
+
+
+class HedgedClient:
+    """
+    Fetch a resource that several endpoints can serve.
+
+    The healthiest endpoint is tried first; the next one is started as soon
+    as the previous one fails or has not answered within `hedge_delay`, and
+    the first successful result wins. Endpoints whose circuit is open are
+    skipped, and the whole call is bounded by `timeout` however many
+    endpoints are tried.
+    """
+
+    def __init__(self, session=None, timeout=MEASUREMENT_TIMEOUT, hedge_delay=MEASUREMENT_HEDGE_DELAY,
+                 breaker=None, max_workers=MEASUREMENT_CONCURRENCY, name="measurements"):
+        # Retries are left to the alternative endpoints rather than repeated
+        # on the same one, so a dead endpoint cannot stretch the deadline
+        self.name = name
+        self.session = session or create_session(pool_size=max_workers, retries=0, name=name)
+        self.timeout = timeout
+        self.hedge_delay = hedge_delay
+        self.breaker = breaker or CircuitBreaker()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedged-request")
+
+    def _attempt(self, name, url, params, parse, deadline):
+        started = time.monotonic()
+        try:
+            response = self.session.get(url, params=params, timeout=max(deadline - time.monotonic(), 0.1))
+            response.raise_for_status()
+            result = parse(response)
+        except Exception as e:
+            if isinstance(e, requests.exceptions.RequestException) and e.response is None:
+                # Calls that got a response were recorded by the session hook
+                record_http(self.name, "GET", url, None, time.monotonic() - started, 0, error=type(e).__name__)
+            self.breaker.record_failure(name)
+            raise
+        self.breaker.record_success(name)
+        return result
+
+    def get(self, endpoints, parse):
+        """
+        GET the first endpoint that answers successfully.
+
+        Args:
+            endpoints (list): (name, url, params) tuples in order of preference
+            parse (callable): Turns a successful response into the result;
+                exceptions it raises count as a failure of that endpoint
+
+        Returns:
+            object: Result of `parse` for the winning endpoint
+
+        Raises:
+            CircuitOpenError: If every endpoint's circuit is open
+            requests.exceptions.Timeout: If no endpoint succeeded within `timeout`
+            Exception: The last endpoint's error if all of them failed
+        """
+        deadline = time.monotonic() + self.timeout
+        by_name = {name: (name, url, params) for name, url, params in endpoints}
+        candidates = [by_name[name] for name in self.breaker.order(list(by_name))]
+        running = {}
+        errors = []
+        next_start = time.monotonic()
+
+        while True:
+            now = time.monotonic()
+            if not running or now >= next_start:
+                while candidates:
+                    name, url, params = candidates.pop(0)
+                    # Checked only when the endpoint is actually used, so a
+                    # probe is never claimed without being sent
+                    if self.breaker.allow(name):
+                        running[self._executor.submit(in_context(self._attempt), name, url, params, parse, deadline)] = name
+                        next_start = now + self.hedge_delay
+                        break
+            if not running:
+                if errors:
+                    raise errors[-1]
+                raise CircuitOpenError(f"All endpoints are unavailable: {', '.join(by_name)}")
+
+            wait_until = min(deadline, next_start) if candidates else deadline
+            done, _ = wait(list(running), timeout=max(wait_until - now, 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                running.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    errors.append(e)
+                    next_start = time.monotonic()
+
+            if time.monotonic() >= deadline:
+                raise requests.exceptions.Timeout(f"No endpoint answered within {self.timeout:g}s")
+
+
+def get_measurement_client():
+    """
+    Return the process-wide measurement client, creating it on first use.
+
+    Returns:
+        HedgedClient: Shared client, safe to use from worker threads
+    """
+    global _measurement_client
+    if _measurement_client is None:
+        with _measurement_client_lock:
+            if _measurement_client is None:
+                _measurement_client = HedgedClient()
+    return _measurement_client
@@ -0,0 +1,235 @@
+import numpy as np
+import pandas as pd
+
+# US EPA AQI breakpoints (2024 revision) in the units of get_pollutant_info():
+# (concentration low, concentration high, index low, index high)
+AQI_BREAKPOINTS = {
+    "pm25": [(0.0, 9.0, 0, 50), (9.1, 35.4, 51, 100), (35.5, 55.4, 101, 150),
+             (55.5, 125.4, 151, 200), (125.5, 225.4, 201, 300), (225.5, 325.4, 301, 500)],
+    "pm10": [(0, 54, 0, 50), (55, 154, 51, 100), (155, 254, 101, 150),
+             (255, 354, 151, 200), (355, 424, 201, 300), (425, 604, 301, 500)],
+    "o3": [(0, 54, 0, 50), (55, 70, 51, 100), (71, 85, 101, 150),
+           (86, 105, 151, 200), (106, 200, 201, 300)],
+    "co": [(0.0, 4.4, 0, 50), (4.5, 9.4, 51, 100), (9.5, 12.4, 101, 150),
+           (12.5, 15.4, 151, 200), (15.5, 30.4, 201, 300), (30.5, 50.4, 301, 500)],
+    "so2": [(0, 35, 0, 50), (36, 75, 51, 100), (76, 185, 101, 150),
+            (186, 304, 151, 200), (305, 604, 201, 300), (605, 1004, 301, 500)],
+    "no2": [(0, 53, 0, 50), (54, 100, 51, 100), (101, 360, 101, 150),
+            (361, 649, 151, 200), (650, 1249, 201, 300), (1250, 2049, 301, 500)]
+}
+
+# Averaging window in hours and decimals concentrations are truncated to
+AQI_AVERAGING = {
+    "pm25": (24, 1),
+    "pm10": (24, 0),
+    "o3": (8, 0),
+    "co": (8, 1),
+    "so2": (1, 0),
+    "no2": (1, 0)
+}
+
+# Minimum share of hourly values an averaging window needs to be valid
+MIN_WINDOW_COVERAGE = 0.75
+
+AQI_CATEGORIES = [
+    (50, "Good"),
+    (100, "Moderate"),
+    (150, "Unhealthy for Sensitive Groups"),
+    (200, "Unhealthy"),
+    (300, "Very Unhealthy"),
+    (np.inf, "Hazardous")
+]
+
+# (averaging window in hours, limit) per standard, in the units of
+# get_pollutant_info(). WHO 2021 guidelines are converted from µg/m³ at 25 °C.
+EXCEEDANCE_THRESHOLDS = {
+    "WHO": {
+        "pm25": (24, 15),
+        "pm10": (24, 45),
+        "o3": (8, 51),
+        "no2": (24, 13.3),
+        "so2": (24, 15.3),
+        "co": (24, 3.5)
+    },
+    "EPA": {
+        "pm25": (24, 35),
+        "pm10": (24, 150),
+        "o3": (8, 70),
+        "co": (8, 9),
+        "no2": (1, 100),
+        "so2": (1, 75)
+    }
+}
+
+
+def aqi_from_concentration(pollutant, concentrations):
+    """
+    Piecewise-linear AQI sub-index for an array of averaged concentrations.
+
+    Args:
+        pollutant (str): Pollutant code with entries in AQI_BREAKPOINTS
+        concentrations (numpy.ndarray): Averaged concentrations
+
+    Returns:
+        numpy.ndarray: AQI values (NaN where the concentration is missing),
+        capped at 500
+    """
+    _, decimals = AQI_AVERAGING[pollutant]
+    scale = 10 ** decimals
+    values = np.floor(np.clip(np.asarray(concentrations, dtype=float), 0, None) * scale) / scale
+
+    table = np.array(AQI_BREAKPOINTS[pollutant], dtype=float)
+    c_lo, c_hi, i_lo, i_hi = table.T
+    # Bucket by lower bound so values between two breakpoints' rounding gap
+    # fall into the lower segment
+    segment = np.clip(np.searchsorted(c_lo, values, side="right") - 1, 0, len(table) - 1)
+    aqi = (i_hi[segment] - i_lo[segment]) / (c_hi[segment] - c_lo[segment]) * (values - c_lo[segment]) + i_lo[segment]
+    aqi = np.minimum(np.round(aqi), 500)
+    aqi[np.isnan(values)] = np.nan
+    return aqi
+
+
+def aqi_category(aqi):
+    """
+    Map AQI values to EPA category names.
+
+    Args:
+        aqi (array-like): AQI values
+
+    Returns:
+        pandas.Series: Category names (None where the AQI is missing)
+    """
+    aqi = pd.Series(aqi)
+    bounds = [-np.inf] + [upper for upper, _ in AQI_CATEGORIES]
+    return pd.cut(aqi, bins=bounds, labels=[name for _, name in AQI_CATEGORIES])
+
+
+def rolling_average(measurements, hours):
+    """
+    Trailing time-based mean of each station/pollutant series.
+
+    Args:
+        measurements (pandas.DataFrame): Long frame with station_id, pollutant
+            and value columns and a DatetimeIndex, sorted by station_id,
+            pollutant and time
+        hours (int): Window length in hours
+
+    Returns:
+        pandas.Series: Averaged values aligned with `measurements`
+    """
+    if hours <= 1:
+        return measurements["value"].astype(float)
+    min_periods = int(np.ceil(hours * MIN_WINDOW_COVERAGE))
+    averaged = (
+        measurements.groupby(["station_id", "pollutant"], sort=False)["value"]
+        .rolling(f"{hours}h", min_periods=min_periods)
+        .mean()
+    )
+    return pd.Series(averaged.to_numpy(), index=measurements.index)
+
+
+def _prepare(measurements):
+    df = measurements[["station_id", "pollutant", "value"]].copy()
+    df["value"] = pd.to_numeric(df["value"], errors="coerce")
+    # Categorical codes keep the per-pollutant masks and group keys cheap on
+    # millions of rows
+    df["pollutant"] = df["pollutant"].astype("category")
+    df.index.name = "datetime"
+    df = df.reset_index().sort_values(["station_id", "pollutant", "datetime"], kind="stable")
+    return df.set_index("datetime")
+
+
+def compute_aqi(measurements):
+    """
+    Hourly AQI, dominant pollutant and category for many stations at once.
+
+    Concentrations are averaged over the standard window of each pollutant
+    (24h for PM, 8h for O3 and CO, 1h for NO2 and SO2) before the breakpoint
+    interpolation; the station AQI is the maximum sub-index.
+
+    Args:
+        measurements (pandas.DataFrame): Long frame with station_id, pollutant
+            and value columns and a DatetimeIndex of hourly measurements
+
+    Returns:
+        pandas.DataFrame: Indexed by (station_id, datetime) with one sub-index
+        column per pollutant plus aqi, dominant_pollutant and category
+    """
+    df = _prepare(measurements[measurements["pollutant"].isin(AQI_BREAKPOINTS.keys())])
+    if df.empty:
+        return pd.DataFrame(columns=["aqi", "dominant_pollutant", "category"])
+
+    sub_indices = pd.Series(np.nan, index=df.index)
+    for pollutant, (hours, _) in AQI_AVERAGING.items():
+        is_pollutant = (df["pollutant"] == pollutant).to_numpy()
+        if not is_pollutant.any():
+            continue
+        subset = df[is_pollutant]
+        sub_indices[is_pollutant] = aqi_from_concentration(pollutant, rolling_average(subset, hours).to_numpy())
+
+    # Scatter sub-indices into a (station-hour x pollutant) matrix
+    station_codes, stations = pd.factorize(df["station_id"], sort=True)
+    time_codes, times = pd.factorize(df.index, sort=True)
+    keys, row = np.unique(station_codes.astype(np.int64) * len(times) + time_codes, return_inverse=True)
+    pollutants = df["pollutant"].cat.categories
+    values = np.full((len(keys), len(pollutants)), np.nan)
+    np.fmax.at(values, (row, df["pollutant"].cat.codes.to_numpy()), sub_indices.to_numpy())
+
+    index = pd.MultiIndex.from_arrays(
+        [stations[keys // len(times)], times[keys % len(times)]],
+        names=["station_id", "datetime"]
+    )
+    hourly = pd.DataFrame(values, index=index, columns=list(pollutants))
+    has_value = ~np.isnan(values).all(axis=1)
+    filled = np.where(np.isnan(values), -1, values)
+    dominant = np.argmax(filled, axis=1)
+    hourly["aqi"] = np.where(has_value, filled[np.arange(len(filled)), dominant], np.nan)
+    hourly["dominant_pollutant"] = np.where(has_value, np.asarray(pollutants)[dominant], None)
+    hourly["category"] = aqi_category(hourly["aqi"].to_numpy()).to_numpy()
+    return hourly
+
+
+def count_exceedances(measurements, thresholds=EXCEEDANCE_THRESHOLDS):
+    """
+    Count hours and days where averaged concentrations exceed WHO/EPA limits.
+
+    Args:
+        measurements (pandas.DataFrame): Long frame with station_id, pollutant
+            and value columns and a DatetimeIndex of hourly measurements
+        thresholds (dict): Standard name to {pollutant: (window hours, limit)}
+
+    Returns:
+        pandas.DataFrame: One row per station, pollutant and standard with
+        limit, exceedance_hours and exceedance_days
+    """
+    df = _prepare(measurements)
+    columns = ["station_id", "pollutant", "standard", "limit", "exceedance_hours", "exceedance_days"]
+    results = []
+    averages = {}
+    for standard, limits in thresholds.items():
+        for pollutant, (hours, limit) in limits.items():
+            is_pollutant = (df["pollutant"] == pollutant).to_numpy()
+            if not is_pollutant.any():
+                continue
+            if (pollutant, hours) not in averages:
+                averages[(pollutant, hours)] = rolling_average(df[is_pollutant], hours)
+            averaged = averages[(pollutant, hours)]
+            exceeded = pd.DataFrame({
+                "station_id": df.loc[is_pollutant, "station_id"].to_numpy(),
+                "day": averaged.index.date,
+                "exceeded": (averaged > limit).to_numpy()
+            })
+            per_station = exceeded.groupby("station_id")["exceeded"].sum().rename("exceedance_hours").to_frame()
+            per_station["exceedance_days"] = (
+                exceeded[exceeded["exceeded"]].groupby("station_id")["day"].nunique()
+                .reindex(per_station.index, fill_value=0)
+            )
+            per_station = per_station.reset_index()
+            per_station["pollutant"] = pollutant
+            per_station["standard"] = standard
+            per_station["limit"] = limit
+            results.append(per_station)
+
+    if not results:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(results, ignore_index=True)[columns]
@@ -0,0 +1,165 @@
+import time
+import requests
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from ingest import parse_json, features_to_geodataframe
+from station_store import load_station_catalog, CATALOG_COLUMNS
+from pollutant_index import build_pollutant_mask
+from api_client import get_session
+from instrumentation import span, record_http, in_context
+from settings import API_BASE_URL, STATION_FETCH_BATCH_SIZE, STATION_FETCH_WORKERS
+
+def get_pollutant_info():
+    return {
+        "pm10": {"name": "Particulate Matter (PM10)", "unit": "μg/m³", "color": "red", 
+                 "description": "Inhalable particles with diameters of 10 micrometers and smaller"},
+        "pm25": {"name": "Fine Particulate Matter (PM2.5)", "unit": "μg/m³", "color": "purple",
+                 "description": "Fine inhalable particles with diameters of 2.5 micrometers and smaller"},
+        "no2": {"name": "Nitrogen Dioxide (NO₂)", "unit": "ppb", "color": "orange",
+                "description": "Toxic gas from vehicle exhaust and power plants"},
+        "so2": {"name": "Sulfur Dioxide (SO₂)", "unit": "ppb", "color": "blue",
+                "description": "Toxic gas from fossil fuel combustion and industrial processes"},
+        "o3": {"name": "Ozone (O₃)", "unit": "ppb", "color": "green",
+               "description": "Ground-level ozone created by chemical reactions between oxides of nitrogen and VOCs"},
+        "co": {"name": "Carbon Monoxide (CO)", "unit": "ppm", "color": "brown",
+               "description": "Toxic gas from vehicle exhaust and incomplete combustion"}
+    }
+
+def get_regions():
+    return {
+        "Asia": ["IN", "PH", "TH", "MY", "ID", "JP", "KR", "CN", "VN", "LK"],
+        "Europe": ["GB", "FR", "DE", "IT", "ES", "TR", "PL", "NL", "BE", "SE"],
+        "North America": ["US", "CA", "MX"],
+        "South America": ["BR", "AR", "CL", "CO", "PE"],
+        "Africa": ["ZA", "NG", "EG", "KE", "MA"],
+        "Oceania": ["AU", "NZ", "FJ"]
+    }
+
+def get_country_codes():
+    return {
+        "US": "United States", "GB": "United Kingdom", "TR": "Turkey",
+        "PH": "Philippines", "IN": "India", "TH": "Thailand",
+        "MY": "Malaysia", "ID": "Indonesia", "JP": "Japan",
+        "KR": "South Korea", "CN": "China", "FR": "France",
+        "DE": "Germany", "IT": "Italy", "ES": "Spain"
+    }
+
+def request_station_data(countries=None, session=None):
+    base_url = f"{API_BASE_URL}/stations"
+    params = {"format": "geojson"}
+    if countries:
+        params["country"] = ",".join(countries)
+    
+    started = time.perf_counter()
+    try:
+        response = (session or get_session()).get(base_url, params=params, timeout=10)
+    except requests.exceptions.RequestException as e:
+        # Calls that got a response are recorded by the session hook
+        record_http("stations", "GET", base_url, None, time.perf_counter() - started, 0, error=type(e).__name__)
+        raise
+    response.raise_for_status()  # Raise an exception for HTTP errors
+    return parse_json(response.content)
+
+def describe_fetch_error(error):
+    if isinstance(error, requests.exceptions.Timeout):
+        return "Request timed out. The server might be experiencing high load."
+    if isinstance(error, requests.exceptions.HTTPError):
+        return f"HTTP Error: {error}"
+    if isinstance(error, requests.exceptions.RequestException):
+        return f"Error fetching data: {error}"
+    if isinstance(error, ValueError):
+        return "Invalid response format. Could not parse JSON."
+    return f"Error fetching data: {error}"
+
+def fetch_station_data_concurrent(countries, batch_size=STATION_FETCH_BATCH_SIZE,
+                                  max_workers=STATION_FETCH_WORKERS):
+    """
+    Fetch stations with one request per batch of countries, run concurrently.
+
+    All requests share the pooled keep-alive session, which retries each batch
+    with backoff on its own. A slow or failing batch no longer sinks the whole
+    selection: successful batches are merged and failures are reported.
+
+    Args:
+        countries (list): ISO country codes to fetch
+        batch_size (int): Number of countries per request
+        max_workers (int): Maximum number of requests in flight
+
+    Returns:
+        tuple: (GeoJSON FeatureCollection dict, dict mapping failed country codes to error messages)
+    """
+    batches = [countries[i:i + batch_size] for i in range(0, len(countries), batch_size)]
+    features = []
+    failed = {}
+    if not batches:
+        return {"type": "FeatureCollection", "features": features}, failed
+    
+    session = get_session()
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+        futures = [(batch, executor.submit(in_context(request_station_data), batch, session)) for batch in batches]
+        for batch, future in futures:
+            try:
+                features.extend(future.result().get("features", []))
+            except (requests.exceptions.RequestException, ValueError) as e:
+                failed.update({country: describe_fetch_error(e) for country in batch})
+    
+    return {"type": "FeatureCollection", "features": features}, failed
+
+def fetch_station_frame(countries):
+    with span("fetch_stations", countries=len(countries)):
+        stations_data, failed = fetch_station_data_concurrent(countries)
+    with span("parse_stations", features=len(stations_data['features'])):
+        return features_to_geodataframe(stations_data['features']), failed
+
+# Text columns stored as categoricals when their values repeat enough
+CATEGORICAL_COLUMNS = ['country_id', 'city_name', 'name']
+CATEGORICAL_MAX_UNIQUE_RATIO = 0.5
+
+def load_catalog(countries):
+    """
+    Load the compact station catalog of `countries`, without any Streamlit output.
+    
+    Args:
+        countries (list): ISO country codes to include
+        
+    Returns:
+        tuple: (geopandas.GeoDataFrame from `compact_catalog`, dict mapping
+        failed country codes to error messages)
+    """
+    # Only countries whose on-disk shard is missing or expired hit the API
+    stations_gdf, failed = load_station_catalog(countries, fetch_station_frame)
+    return compact_catalog(stations_gdf), failed
+
+def compact_catalog(stations_gdf):
+    """
+    Shrink a station catalog for sharing between sessions.
+    
+    Repeated text (countries, cities) becomes categorical codes and the
+    per-station pollutant lists are replaced by the pollutant_mask bitmask
+    (decode with `pollutant_index.mask_codes`). Missing CATALOG_COLUMNS are
+    added empty, so even a catalog where every fetch failed has the columns
+    the dashboard reads. The result is shared as is by the process-wide
+    shared cache and must be treated as read-only.
+    
+    Args:
+        stations_gdf (geopandas.GeoDataFrame): Catalog as fetched
+        
+    Returns:
+        geopandas.GeoDataFrame: Catalog with a pollutant_mask column and no pollutants column
+    """
+    missing = [column for column in CATALOG_COLUMNS if column not in stations_gdf.columns]
+    if missing:
+        stations_gdf = stations_gdf.assign(**{
+            column: pd.Series(None, index=stations_gdf.index, dtype=object) for column in missing
+        })
+    
+    # Station × pollutant index, built once per loaded catalog
+    mask = build_pollutant_mask(stations_gdf['pollutants'], list(get_pollutant_info().keys()))
+    stations_gdf = stations_gdf.drop(columns='pollutants').assign(pollutant_mask=mask)
+    
+    for column in CATEGORICAL_COLUMNS:
+        if column in stations_gdf.columns and not isinstance(stations_gdf[column].dtype, pd.CategoricalDtype):
+            values = stations_gdf[column]
+            if values.nunique() <= CATEGORICAL_MAX_UNIQUE_RATIO * len(values):
+                stations_gdf[column] = values.astype('category')
+    return stations_gdf
@@ -1,80 +1,200 @@
 import streamlit as st
-import folium
-from folium import plugins
-from streamlit_folium import folium_static
-import plotly.express as px
 import pandas as pd
-import geopandas as gpd
 import requests
+import uuid
 from datetime import datetime, timedelta
-from data_export import add_export_section, export_map_as_html
-from time_series import add_time_series_section
+from data_export import add_export_section, add_map_export
+from ingest import features_to_geodataframe
+from analysis import pollutant_coverage, country_distribution, city_distribution, pollutant_distribution
+from instrumentation import trace, span, counted_cache, cache_totals
+from shared_cache import get_shared_cache
+from settings import NEARBY_RADIUS_KM, DEBUG_PANEL, CATALOG_CACHE_TTL
+from catalog import (
+    get_pollutant_info, get_regions, get_country_codes, request_station_data,
+    describe_fetch_error, load_catalog, compact_catalog
+)
 
-def get_pollutant_info():
-    return {
-        "pm10": {"name": "Particulate Matter (PM10)", "unit": "μg/m³", "color": "red", 
-                 "description": "Inhalable particles with diameters of 10 micrometers and smaller"},
-        "pm25": {"name": "Fine Particulate Matter (PM2.5)", "unit": "μg/m³", "color": "purple",
-                 "description": "Fine inhalable particles with diameters of 2.5 micrometers and smaller"},
-        "no2": {"name": "Nitrogen Dioxide (NO₂)", "unit": "ppb", "color": "orange",
-                "description": "Toxic gas from vehicle exhaust and power plants"},
-        "so2": {"name": "Sulfur Dioxide (SO₂)", "unit": "ppb", "color": "blue",
-                "description": "Toxic gas from fossil fuel combustion and industrial processes"},
-        "o3": {"name": "Ozone (O₃)", "unit": "ppb", "color": "green",
-               "description": "Ground-level ozone created by chemical reactions between oxides of nitrogen and VOCs"},
-        "co": {"name": "Carbon Monoxide (CO)", "unit": "ppm", "color": "brown",
-               "description": "Toxic gas from vehicle exhaust and incomplete combustion"}
-    }
+# The shared cache hands every session the same compact catalog, loaded once
+# even when sessions ask for it at the same time; callers must not modify it.
+# Each load gets a new version token that keys the caches derived from it.
+def _load_station_catalog(selected_countries):
+    countries = sorted(selected_countries)
+    
+    def load():
+        if not countries:
+            # Errors propagate so that no empty catalog is cached; load_data reports them
+            stations_data = request_station_data()
+            stations_gdf = compact_catalog(features_to_geodataframe(stations_data['features']))
+            return stations_gdf, {}, uuid.uuid4().hex
+        stations_gdf, failed = load_catalog(countries)
+        return stations_gdf, failed, uuid.uuid4().hex
+    
+    # A partial catalog is not kept; the next rerun retries the failed countries
+    return get_shared_cache().get_or_load(
+        "station_catalog", tuple(countries), load,
+        ttl=CATALOG_CACHE_TTL, keep=lambda result: not result[1]
+    )
 
-def get_regions():
-    return {
-        "Asia": ["IN", "PH", "TH", "MY", "ID", "JP", "KR", "CN", "VN", "LK"],
-        "Europe": ["GB", "FR", "DE", "IT", "ES", "TR", "PL", "NL", "BE", "SE"],
-        "North America": ["US", "CA", "MX"],
-        "South America": ["BR", "AR", "CL", "CO", "PE"],
-        "Africa": ["ZA", "NG", "EG", "KE", "MA"],
-        "Oceania": ["AU", "NZ", "FJ"]
-    }
+# The derived caches take the catalog itself (not hashed) and its version
+# token, so they are only reused for the exact catalog they were built from
+@counted_cache(st.cache_data(ttl=3600, max_entries=8), "density_grid")
+def load_density_grid(_stations_gdf, catalog_version):
+    from density_grid import build_density_grid
+    return build_density_grid(_stations_gdf)
 
-def get_country_codes():
-    return {
-        "US": "United States", "GB": "United Kingdom", "TR": "Turkey",
-        "PH": "Philippines", "IN": "India", "TH": "Thailand",
-        "MY": "Malaysia", "ID": "Indonesia", "JP": "Japan",
-        "KR": "South Korea", "CN": "China", "FR": "France",
-        "DE": "Germany", "IT": "Italy", "ES": "Spain"
-    }
+@counted_cache(st.cache_resource(ttl=3600, max_entries=8), "station_index")
+def load_station_index(_stations_gdf, catalog_version):
+    from spatial_index import StationIndex
+    return StationIndex(_stations_gdf)
 
-def fetch_station_data(countries=None):
-    base_url = "https://api.energyandcleanair.org/stations"
-    params = {"format": "geojson"}
-    if countries:
-        params["country"] = ",".join(countries)
+# The map document is the largest artifact of the app: it is rendered once per
+# catalog and pollutant selection and reused for display and download
+@counted_cache(st.cache_data(ttl=3600, max_entries=8, show_spinner=False), "station_map")
+def render_station_map(_stations_gdf, catalog_version, selected_pollutants):
+    from map_layers import build_station_map, render_map_html
+    pollutant_info = get_pollutant_info()
+    measures_selected = pollutant_coverage(_stations_gdf, selected_pollutants, list(pollutant_info.keys()))
+    m = build_station_map(
+        _stations_gdf[measures_selected],
+        selected_pollutants,
+        pollutant_info,
+        get_country_codes(),
+        density_grid=load_density_grid(_stations_gdf, catalog_version)
+    )
+    return render_map_html(m)
+
+def load_data(selected_countries):
+    """
+    Load the station catalog of the selected countries and report the ones that failed.
     
+    Returns:
+        tuple: (stations GeoDataFrame, catalog version token for the derived caches)
+    """
     try:
-        response = requests.get(base_url, params=params, timeout=10)
-        response.raise_for_status()  # Raise an exception for HTTP errors
-        return response.json()
-    except requests.exceptions.Timeout:
-        st.error("Request timed out. The server might be experiencing high load.")
-        return {"type": "FeatureCollection", "features": []}
-    except requests.exceptions.HTTPError as e:
-        st.error(f"HTTP Error: {e}")
-        return {"type": "FeatureCollection", "features": []}
-    except requests.exceptions.RequestException as e:
-        st.error(f"Error fetching data: {e}")
-        return {"type": "FeatureCollection", "features": []}
-    except ValueError:
-        st.error("Invalid response format. Could not parse JSON.")
-        return {"type": "FeatureCollection", "features": []}
+        stations_gdf, failed, catalog_version = _load_station_catalog(selected_countries)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        st.error(describe_fetch_error(e))
+        return compact_catalog(features_to_geodataframe([])), None
+    if failed:
+        by_error = {}
+        for country, message in failed.items():
+            by_error.setdefault(message, []).append(country)
+        for message, countries in by_error.items():
+            st.error(f"Stations for {', '.join(sorted(countries))} could not be loaded. {message}")
+    return stations_gdf, catalog_version
 
-@st.cache_data(ttl=3600)
-def load_data(selected_countries):
-    stations_data = fetch_station_data(selected_countries)
-    stations_gdf = gpd.GeoDataFrame.from_features(stations_data['features'])
-    return stations_gdf
+def show_interactive_map(stations_gdf, measures_selected, station_index, selected_pollutants, pollutant_info):
+    """
+    Interactive map that only draws the stations in the current viewport and
+    lists the stations near a clicked location.
+    """
+    import folium
+    from streamlit_folium import st_folium
+    from map_layers import build_viewport_layer
+    from spatial_index import viewport_bounds
+    
+    country_names = get_country_codes()
+    view = st.session_state.get("station_map") or {}
+    bounds = viewport_bounds(view.get("bounds"))
+    if bounds:
+        visible = station_index.bbox(*bounds)
+    else:
+        visible = station_index.positions
+    visible = visible[measures_selected.to_numpy()[visible]]
+    
+    layer, drawn = build_viewport_layer(stations_gdf.iloc[visible], selected_pollutants, pollutant_info, country_names)
+    result = st_folium(
+        folium.Map(location=[20, 0], zoom_start=2),
+        key="station_map",
+        height=600,
+        use_container_width=True,
+        feature_group_to_add=layer,
+        returned_objects=["bounds", "last_clicked"]
+    )
+    if drawn < len(visible):
+        st.caption(f"Showing {drawn:,} of {len(visible):,} stations in view; zoom in to see all of them.")
+    
+    clicked = (result or {}).get("last_clicked")
+    if not clicked:
+        st.caption("Click on the map to list the nearest stations.")
+        return
+    
+    lat, lon = clicked["lat"], clicked["lng"]
+    st.session_state["map_clicked"] = (lat, lon)
+    positions, distances = station_index.within_radius(lat, lon, NEARBY_RADIUS_KM)
+    if not len(positions):
+        positions, distances = station_index.nearest(lat, lon, k=5)
+    nearby = stations_gdf.iloc[positions]
+    st.markdown(f"**Stations near {lat:.3f}, {lon:.3f}**")
+    st.dataframe(pd.DataFrame({
+        "Station": nearby["name"].to_numpy(),
+        "City": nearby["city_name"].to_numpy(),
+        "Country": nearby["country_id"].astype(object).map(country_names).fillna(nearby["country_id"].astype(object)).to_numpy(),
+        "Distance (km)": distances.round(1)
+    }), hide_index=True, width="stretch")
+
+def show_debug_panel(rerun):
+    """
+    Sidebar breakdown of a rerun: spans in start order, HTTP calls per client,
+    cache lookups (this rerun and since the process started) and the memory
+    use of the shared cache.
+    """
+    with st.sidebar.expander("Debug", expanded=False):
+        st.caption(f"Rerun {rerun.trace_id} took {rerun.duration * 1000:,.0f} ms")
+        
+        if rerun.spans:
+            spans = pd.DataFrame(rerun.spans).sort_values(["offset_ms", "depth"], kind="stable")
+            st.dataframe(pd.DataFrame({
+                "Span": ["· " * depth + name.rsplit("/", 1)[-1] for depth, name in zip(spans["depth"], spans["name"])],
+                "ms": spans["duration_ms"].to_numpy(),
+                "RSS Δ (MB)": spans["rss_delta_mb"].to_numpy()
+            }), hide_index=True, width="stretch")
+        
+        if rerun.http:
+            calls = pd.DataFrame(rerun.http)
+            st.dataframe(calls.groupby("client").agg(
+                calls=("latency_ms", "size"),
+                errors=("error", "count"),
+                kb=("bytes", lambda b: round(b.sum() / 1024, 1)),
+                mean_ms=("latency_ms", "mean"),
+                max_ms=("latency_ms", "max")
+            ).round(1), width="stretch")
+        else:
+            st.caption("No HTTP calls in this rerun.")
+        
+        totals = cache_totals()
+        if totals:
+            st.dataframe(pd.DataFrame([
+                {
+                    "Cache": name,
+                    "Hits": rerun.cache.get(name, {}).get("hits", 0),
+                    "Misses": rerun.cache.get(name, {}).get("misses", 0),
+                    "Hit rate (all)": counts["hits"] / max(counts["hits"] + counts["misses"], 1)
+                }
+                for name, counts in sorted(totals.items())
+            ]).style.format({"Hit rate (all)": "{:.0%}"}), hide_index=True, width="stretch")
+        
+        shared = get_shared_cache().stats()
+        st.caption(f"Shared cache: {shared['bytes'] / 2 ** 20:,.1f} of {shared['max_bytes'] / 2 ** 20:,.0f} MB")
+        if shared["namespaces"]:
+            st.dataframe(pd.DataFrame([
+                {
+                    "Namespace": name,
+                    "Entries": counts["entries"],
+                    "MB": round(counts["bytes"] / 2 ** 20, 1),
+                    "Coalesced": counts["coalesced"],
+                    "Evicted": counts["evictions"]
+                }
+                for name, counts in sorted(shared["namespaces"].items())
+            ]), hide_index=True, width="stretch")
 
 def create_dashboard():
+    with trace("rerun") as rerun:
+        _create_dashboard()
+    if DEBUG_PANEL:
+        show_debug_panel(rerun)
+
+def _create_dashboard():
     st.title("🌍 Air Quality Monitoring Network Analysis")
     
     # Sidebar configuration
@@ -107,161 +227,149 @@ def create_dashboard():
         format_func=lambda x: pollutant_info[x]["name"]
     )
     
-    # Load data
-    with st.spinner("Loading monitoring station data..."):
-        stations_gdf = load_data(selected_countries)
+    interactive_map = st.sidebar.checkbox(
+        "Interactive map",
+        value=False,
+        help="Only draw the stations in view and list the stations near a clicked location"
+    )
     
-    # Main content tabs
+    # Load data
+    with st.spinner("Loading monitoring station data..."), span("load_data", countries=len(selected_countries)):
+        stations_gdf, catalog_version = load_data(selected_countries)
+
+    if stations_gdf.empty:
+        # load_data has already reported any countries that failed
+        st.info("No monitoring stations to show for the selected countries. Adjust the filters or try again later.")
+        return
+
+    # Main content tabs. Switching tabs reruns the app and only the open tab
+    # is computed; heavy libraries are imported by the first tab that needs them
     tab1, tab2, tab3, tab4 = st.tabs([
         "Network Overview",
         "Station Distribution",
         "Pollutant Analysis",
         "Time Series Analysis"
-    ])
+    ], key="dashboard_tab", on_change="rerun")
     
-    with tab1:
-        col1, col2 = st.columns(2)
-        with col1:
-            st.metric("Total Monitoring Stations", len(stations_gdf))
-        with col2:
-            coverage = len(stations_gdf[
-                stations_gdf['pollutants'].apply(
-                    lambda x: any(p in x for p in selected_pollutants) if isinstance(x, list) else False
-                )
-            ])
-            st.metric(f"Stations Measuring Selected Pollutants", coverage)
-        
-        st.subheader("Monitoring Station Network")
-        
-        # Create map
-        m = folium.Map(location=[20, 0], zoom_start=2)
-        marker_cluster = plugins.MarkerCluster()
-        
-        # Add stations to map
-        for _, row in stations_gdf.iterrows():
-            pollutants = row['pollutants'] if isinstance(row['pollutants'], list) else []
-            if any(p in pollutants for p in selected_pollutants):
-                color = next((pollutant_info[p]["color"] for p in selected_pollutants if p in pollutants), "gray")
+    if tab1.open:
+        with tab1, span("network_overview"):
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("Total Monitoring Stations", len(stations_gdf))
+            measures_selected = pollutant_coverage(stations_gdf, selected_pollutants, list(pollutant_info.keys()))
+            with col2:
+                coverage = int(measures_selected.sum())
+                st.metric(f"Stations Measuring Selected Pollutants", coverage)
+            
+            st.subheader("Monitoring Station Network")
+            
+            if interactive_map:
+                with span("interactive_map"):
+                    station_index = load_station_index(stations_gdf, catalog_version)
+                    show_interactive_map(stations_gdf, measures_selected, station_index, selected_pollutants, pollutant_info)
+            else:
+                # Create map
+                with span("station_map", stations=coverage):
+                    map_html = render_station_map(stations_gdf, catalog_version, selected_pollutants)
                 
-                popup_content = f"""
-                <div style='min-width: 200px'>
-                    <h4>{row['name']}</h4>
-                    <b>Location:</b> {row['city_name']}, {get_country_codes().get(row['country_id'], row['country_id'])}<br>
-                    <b>Pollutants Measured:</b><br>
-                """
-                for p in pollutants:
-                    if p in pollutant_info:
-                        popup_content += f"• {pollutant_info[p]['name']} ({pollutant_info[p]['unit']})<br>"
-                popup_content += "</div>"
+                # Display full-width map
+                with span("map_display", kb=len(map_html) // 1024):
+                    st.iframe(map_html, height=600)
                 
-                folium.CircleMarker(
-                    location=[row.geometry.y, row.geometry.x],
-                    radius=8,
-                    color=color,
-                    fill=True,
-                    popup=folium.Popup(popup_content, max_width=300)
-                ).add_to(marker_cluster)
-        
-        marker_cluster.add_to(m)
-        
-        # Display full-width map
-        st.components.v1.html(m._repr_html_(), height=600)
-        
-        # Add map export option
-        export_map_as_html(m, filename=f"air_quality_map_{datetime.now().strftime('%Y%m%d')}.html")
-        
-        # Pollutant legend
-        st.markdown("### Monitored Pollutants Information")
-        cols = st.columns(2)
-        for idx, (code, info) in enumerate(pollutant_info.items()):
-            col = cols[idx % 2]
-            with col:
-                st.markdown(
-                    f"<div style='color:{info['color']};'>"
-                    f"<h4>●  {info['name']}</h4>"
-                    f"<p>Unit: {info['unit']}<br>"
-                    f"{info['description']}</p></div>",
-                    unsafe_allow_html=True
+                # Add map export option; the file is only built when a download is requested
+                add_map_export(
+                    lambda: render_station_map(stations_gdf, catalog_version, selected_pollutants),
+                    filename=f"air_quality_map_{datetime.now().strftime('%Y%m%d')}.html"
                 )
+            
+            # Pollutant legend
+            st.markdown("### Monitored Pollutants Information")
+            cols = st.columns(2)
+            for idx, (code, info) in enumerate(pollutant_info.items()):
+                col = cols[idx % 2]
+                with col:
+                    st.markdown(
+                        f"<div style='color:{info['color']};'>"
+                        f"<h4>●  {info['name']}</h4>"
+                        f"<p>Unit: {info['unit']}<br>"
+                        f"{info['description']}</p></div>",
+                        unsafe_allow_html=True
+                    )
     
-    with tab2:
-        st.subheader("Geographic Distribution Analysis")
-        
-        # Country-level analysis
-        country_data = stations_gdf['country_id'].value_counts().reset_index()
-        country_data.columns = ['Country', 'Station Count']
-        country_data['Country'] = country_data['Country'].map(get_country_codes())
-        country_data = country_data.dropna(subset=['Country'])
-        
-        fig = px.bar(
-            country_data,
-            x='Country',
-            y='Station Count',
-            title='Monitoring Stations by Country',
-            color='Station Count',
-            color_continuous_scale='Viridis'
-        )
-        st.plotly_chart(fig, use_container_width=True)
-        
-        # Add export functionality for country data
-        add_export_section(country_data, section_name="country_distribution")
-        
-        # City-level analysis
-        st.subheader("City-level Distribution")
-        selected_country = st.selectbox(
-            "Select Country for Detailed Analysis",
-            options=[c for c in country_data['Country'].tolist() if pd.notna(c)]
-        )
-        
-        if selected_country and selected_country in {v: k for k, v in get_country_codes().items()}:
-            country_code = {v: k for k, v in get_country_codes().items()}[selected_country]
-            city_data = stations_gdf[stations_gdf['country_id'] == country_code]
-            city_data = city_data[city_data['city_name'].notna()]
-            city_counts = city_data.groupby('city_name').size().reset_index()
-            city_counts.columns = ['City', 'Station Count']
+    if tab2.open:
+        with tab2, span("station_distribution"):
+            import plotly.express as px
+                
+            st.subheader("Geographic Distribution Analysis")
+            
+            # Country-level analysis
+            country_data = country_distribution(stations_gdf, get_country_codes())
             
-            fig = px.treemap(
-                city_counts,
-                path=['City'],
-                values='Station Count',
-                title=f'Monitoring Station Distribution in {selected_country}'
+            with span("country_chart"):
+                fig = px.bar(
+                    country_data,
+                    x='Country',
+                    y='Station Count',
+                    title='Monitoring Stations by Country',
+                    color='Station Count',
+                    color_continuous_scale='Viridis'
+                )
+                st.plotly_chart(fig, width="stretch")
+            
+            # Add export functionality for country data
+            add_export_section(country_data, section_name="country_distribution")
+            
+            # City-level analysis
+            st.subheader("City-level Distribution")
+            selected_country = st.selectbox(
+                "Select Country for Detailed Analysis",
+                options=[c for c in country_data['Country'].tolist() if pd.notna(c)]
             )
-            st.plotly_chart(fig, use_container_width=True)
             
-            # Add export functionality for city data
-            add_export_section(city_counts, section_name="city_distribution")
+            if selected_country and selected_country in {v: k for k, v in get_country_codes().items()}:
+                country_code = {v: k for k, v in get_country_codes().items()}[selected_country]
+                city_counts = city_distribution(stations_gdf, country_code)
+                
+                with span("city_chart"):
+                    fig = px.treemap(
+                        city_counts,
+                        path=['City'],
+                        values='Station Count',
+                        title=f'Monitoring Station Distribution in {selected_country}'
+                    )
+                    st.plotly_chart(fig, width="stretch")
+                
+                # Add export functionality for city data
+                add_export_section(city_counts, section_name="city_distribution")
     
-    with tab3:
-        st.subheader("Pollutant Coverage Analysis")
-        
-        pollutant_data = []
-        for _, row in stations_gdf.iterrows():
-            station_pollutants = row['pollutants'] if isinstance(row['pollutants'], list) else []
-            for pollutant in station_pollutants:
-                if pollutant in pollutant_info:
-                    pollutant_data.append({
-                        'Country': get_country_codes().get(row['country_id'], row['country_id']),
-                        'Pollutant': pollutant_info[pollutant]['name']
-                    })
-        
-        pollutant_df = pd.DataFrame(pollutant_data)
-        
-        fig = px.histogram(
-            pollutant_df,
-            x='Country',
-            color='Pollutant',
-            barmode='group',
-            title='Pollutant Measurement Capabilities by Country',
-            labels={'count': 'Number of Stations'}
-        )
-        fig.update_layout(bargap=0.1)
-        st.plotly_chart(fig, use_container_width=True)
-        
-        # Add export functionality for pollutant data
-        add_export_section(pollutant_df, section_name="pollutant_analysis")
+    if tab3.open:
+        with tab3, span("pollutant_analysis"):
+            import plotly.express as px
+                
+            st.subheader("Pollutant Coverage Analysis")
+            
+            pollutant_df = pollutant_distribution(stations_gdf, pollutant_info, get_country_codes())
+            
+            with span("pollutant_chart"):
+                fig = px.bar(
+                    pollutant_df,
+                    x='Country',
+                    y='Station Count',
+                    color='Pollutant',
+                    barmode='group',
+                    title='Pollutant Measurement Capabilities by Country',
+                    labels={'Station Count': 'Number of Stations'}
+                )
+                fig.update_layout(bargap=0.1)
+                st.plotly_chart(fig, width="stretch")
+            
+            # Add export functionality for pollutant data
+            add_export_section(pollutant_df, section_name="pollutant_analysis")
     
-    with tab4:
-        add_time_series_section(stations_gdf, pollutant_info)
+    if tab4.open:
+        with tab4, span("time_series"):
+            from time_series import add_time_series_section
+            add_time_series_section(stations_gdf, pollutant_info, load_station_index(stations_gdf, catalog_version))
 
 if __name__ == "__main__":
     create_dashboard()
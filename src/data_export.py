@@ -1,68 +1,244 @@
 import streamlit as st
 import pandas as pd
-import json
-import base64
+import gzip
 import io
+import pyarrow as pa
+import pyarrow.parquet as pq
 from datetime import datetime
+from instrumentation import span, counted_cache
+from settings import EXPORT_CHUNK_ROWS
 
-def get_csv_download_link(df, filename="data.csv", button_text="Download CSV"):
+# Rows per Excel worksheet, including the header row
+EXCEL_MAX_ROWS = 1_048_576
+
+def _strip_timezones(df):
+    """Excel cannot store timezone-aware datetimes; convert them to naive UTC."""
+    if isinstance(df.index, pd.DatetimeIndex) and df.index.tz is not None:
+        df = df.copy(deep=False)
+        df.index = df.index.tz_convert("UTC").tz_localize(None)
+    tz_columns = [c for c in df.columns if isinstance(df[c].dtype, pd.DatetimeTZDtype)]
+    if tz_columns:
+        df = df.copy(deep=False)
+        for column in tz_columns:
+            df[column] = df[column].dt.tz_convert("UTC").dt.tz_localize(None)
+    return df
+
+def _iter_chunks(df, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield consecutive row slices of `df`; an empty frame yields one empty slice."""
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield start, df.iloc[start:start + chunk_rows]
+
+def to_csv_bytes(df):
     """
-    Generate a download link for a DataFrame as CSV.
+    Serialize a DataFrame as CSV, one chunk of rows at a time.
     
     Args:
         df (pandas.DataFrame): The DataFrame to export
-        filename (str): The name of the file to download
-        button_text (str): Text to display on the download button
         
     Returns:
-        None: Displays a download button directly
+        bytes: UTF-8 encoded CSV
     """
-    csv = df.to_csv(index=True)
-    b64 = base64.b64encode(csv.encode()).decode()
-    href = f'<a href="data:file/csv;base64,{b64}" download="{filename}">{button_text}</a>'
-    return st.markdown(href, unsafe_allow_html=True)
+    output = io.BytesIO()
+    for start, chunk in _iter_chunks(df):
+        output.write(chunk.to_csv(index=True, header=start == 0).encode())
+    return output.getvalue()
 
-def get_excel_download_link(df, filename="data.xlsx", button_text="Download Excel"):
+def _excel_value(value):
+    if isinstance(value, (list, tuple, dict, set)):
+        return str(value)
+    return value
+
+def to_excel_bytes(df):
     """
-    Generate a download link for a DataFrame as Excel.
+    Serialize a DataFrame as an Excel workbook in xlsxwriter's constant_memory mode.
+    
+    Rows are written strictly in order and flushed as they go, so the
+    workbook never holds more than one row in memory. Frames longer than an
+    Excel sheet continue on additional sheets.
     
     Args:
         df (pandas.DataFrame): The DataFrame to export
-        filename (str): The name of the file to download
-        button_text (str): Text to display on the download button
         
     Returns:
-        None: Displays a download button directly
+        bytes: XLSX file contents
     """
+    import xlsxwriter
+    
+    df = _strip_timezones(df)
     output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, sheet_name='Data', index=True)
+    workbook = xlsxwriter.Workbook(output, {
+        "constant_memory": True,
+        "default_date_format": "yyyy-mm-dd hh:mm:ss"
+    })
+    header = [name if name is not None else "" for name in df.index.names] + [str(c) for c in df.columns]
+    rows_per_sheet = EXCEL_MAX_ROWS - 1
     
-    b64 = base64.b64encode(output.getvalue()).decode()
-    href = f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="{filename}">{button_text}</a>'
-    return st.markdown(href, unsafe_allow_html=True)
+    worksheet = None
+    for start, chunk in _iter_chunks(df):
+        # Missing values become blank cells
+        chunk = chunk.reset_index().astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        for offset, row in enumerate(chunk.itertuples(index=False, name=None)):
+            position = start + offset
+            if position % rows_per_sheet == 0:
+                sheet_number = position // rows_per_sheet + 1
+                worksheet = workbook.add_worksheet("Data" if sheet_number == 1 else f"Data_{sheet_number}")
+                worksheet.write_row(0, 0, header)
+            worksheet.write_row(position % rows_per_sheet + 1, 0, [_excel_value(v) for v in row])
+    
+    if worksheet is None:
+        workbook.add_worksheet("Data").write_row(0, 0, header)
+    workbook.close()
+    return output.getvalue()
 
-def get_json_download_link(df, filename="data.json", button_text="Download JSON"):
+def to_json_bytes(df):
     """
-    Generate a download link for a DataFrame as JSON.
+    Serialize a DataFrame as a JSON array of records, one chunk of rows at a time.
+    
+    Args:
+        df (pandas.DataFrame): The DataFrame to export
+        
+    Returns:
+        bytes: UTF-8 encoded JSON
+    """
+    output = io.BytesIO()
+    output.write(b"[")
+    for start, chunk in _iter_chunks(df):
+        records = chunk.to_json(orient='records', date_format='iso')[1:-1]
+        if records:
+            if start > 0:
+                output.write(b",")
+            output.write(records.encode())
+    output.write(b"]")
+    return output.getvalue()
+
+def to_jsonl_bytes(df):
+    """
+    Serialize a DataFrame as JSON Lines, one chunk of rows at a time.
+    
+    Unlike the JSON export, the index is included as a field so time series
+    keep their timestamps.
     
     Args:
         df (pandas.DataFrame): The DataFrame to export
-        filename (str): The name of the file to download
-        button_text (str): Text to display on the download button
         
     Returns:
-        None: Displays a download button directly
+        bytes: UTF-8 encoded JSON Lines
+    """
+    output = io.BytesIO()
+    for _, chunk in _iter_chunks(df):
+        if chunk.empty:
+            continue
+        lines = chunk.reset_index().to_json(orient='records', lines=True, date_format='iso')
+        output.write(lines.encode())
+        if not lines.endswith("\n"):
+            output.write(b"\n")
+    return output.getvalue()
+
+def _write_arrow_chunks(df, open_writer):
+    """
+    Convert `df` to Arrow one chunk at a time and pass each table to a writer.
+    
+    Args:
+        df (pandas.DataFrame): The DataFrame to export
+        open_writer (callable): Takes the Arrow schema and returns a writer
+            with `write_table` and `close` methods
     """
-    json_str = df.to_json(orient='records', date_format='iso')
-    b64 = base64.b64encode(json_str.encode()).decode()
-    href = f'<a href="data:file/json;base64,{b64}" download="{filename}">{button_text}</a>'
-    return st.markdown(href, unsafe_allow_html=True)
+    schema = None
+    writer = None
+    for _, chunk in _iter_chunks(df):
+        table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=True)
+        if writer is None:
+            schema = table.schema
+            writer = open_writer(schema)
+        writer.write_table(table)
+    writer.close()
+
+def to_parquet_bytes(df):
+    """
+    Serialize a DataFrame as Parquet with one row group per chunk.
+    
+    Args:
+        df (pandas.DataFrame): The DataFrame to export
+        
+    Returns:
+        bytes: Parquet file contents
+    """
+    output = io.BytesIO()
+    _write_arrow_chunks(df, lambda schema: pq.ParquetWriter(output, schema))
+    return output.getvalue()
+
+def to_feather_bytes(df):
+    """
+    Serialize a DataFrame as an Arrow IPC (Feather v2) file, one record batch per chunk.
+    
+    Args:
+        df (pandas.DataFrame): The DataFrame to export
+        
+    Returns:
+        bytes: Feather file contents
+    """
+    output = io.BytesIO()
+    _write_arrow_chunks(df, lambda schema: pa.ipc.new_file(output, schema))
+    return output.getvalue()
+
+EXPORT_FORMATS = {
+    "csv": {"label": "📄 Download CSV", "mime": "text/csv", "serializer": to_csv_bytes},
+    "xlsx": {"label": "📊 Download Excel",
+             "mime": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+             "serializer": to_excel_bytes},
+    "json": {"label": "🔄 Download JSON", "mime": "application/json", "serializer": to_json_bytes},
+    "jsonl": {"label": "📜 Download JSON Lines", "mime": "application/x-ndjson", "serializer": to_jsonl_bytes},
+    "parquet": {"label": "🧱 Download Parquet", "mime": "application/vnd.apache.parquet",
+                "serializer": to_parquet_bytes},
+    "feather": {"label": "🪶 Download Feather", "mime": "application/vnd.apache.arrow.file",
+                "serializer": to_feather_bytes}
+}
+
+def frame_version(df):
+    """
+    Content hash identifying a version of a DataFrame.
+    
+    Args:
+        df (pandas.DataFrame): The DataFrame to identify
+        
+    Returns:
+        str: Hash of the index, columns and values
+    """
+    try:
+        values_hash = pd.util.hash_pandas_object(df, index=True).sum()
+    except TypeError:
+        # Unhashable cells such as lists
+        values_hash = pd.util.hash_pandas_object(df.astype(str), index=True).sum()
+    return f"{len(df)}:{tuple(df.columns)}:{values_hash}"
+
+@counted_cache(st.cache_data(max_entries=32, show_spinner=False), "export_files")
+def serialize_frame(_df, version, export_format):
+    """
+    Serialize a DataFrame, cached per (DataFrame version, format).
+    
+    Args:
+        _df (pandas.DataFrame): The DataFrame to export (not hashed; `version` identifies it)
+        version (str): Result of `frame_version` for the DataFrame
+        export_format (str): Key of EXPORT_FORMATS
+        
+    Returns:
+        bytes: Serialized file contents
+    """
+    with span("export", format=export_format, rows=len(_df)):
+        return EXPORT_FORMATS[export_format]["serializer"](_df)
+
+def _export_callback(df, export_format):
+    return lambda: serialize_frame(df, frame_version(df), export_format)
 
 def add_export_section(df, section_name="data"):
     """
     Add export functionality to a section of the dashboard.
     
+    Nothing is serialized while rendering the section: each download button
+    builds its file only when clicked, and the bytes are cached per
+    DataFrame version so repeated downloads are served directly.
+    
     Args:
         df (pandas.DataFrame): The DataFrame to export
         section_name (str): Name of the section (used for filenames)
@@ -80,34 +256,55 @@ def add_export_section(df, section_name="data"):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename_base = f"air_quality_{section_name}_{timestamp}"
     
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        get_csv_download_link(df, filename=f"{filename_base}.csv", button_text="📄 Download CSV")
-    
-    with col2:
-        get_excel_download_link(df, filename=f"{filename_base}.xlsx", button_text="📊 Download Excel")
-    
-    with col3:
-        get_json_download_link(df, filename=f"{filename_base}.json", button_text="🔄 Download JSON")
+    cols = st.columns(3)
+    for idx, (extension, export) in enumerate(EXPORT_FORMATS.items()):
+        with cols[idx % 3]:
+            st.download_button(
+                export["label"],
+                data=_export_callback(df, extension),
+                file_name=f"{filename_base}.{extension}",
+                mime=export["mime"],
+                key=f"export_{section_name}_{extension}",
+                on_click="ignore"
+            )
     
     # Preview of data
     with st.expander("Preview Data"):
         st.dataframe(df.head(10))
         st.info(f"Showing 10 of {len(df)} rows. Download the full dataset using the buttons above.")
 
-def export_map_as_html(m, filename="map.html"):
+def add_map_export(render_html, filename="map.html"):
     """
-    Provide a download link for a Folium map as HTML.
+    Provide download buttons for a map, as HTML and as gzip-compressed HTML.
+    
+    Nothing is built while rendering the buttons: `render_html` is only
+    called when one is clicked and should be cached, so the download reuses
+    the document already rendered for display.
     
     Args:
-        m (folium.Map): The Folium map to export
+        render_html (callable): Returns the map as a standalone HTML document (str)
         filename (str): The name of the file to download
         
     Returns:
-        None: Displays a download button directly
+        None: Displays the download buttons directly
     """
-    html_string = m._repr_html_()
-    b64 = base64.b64encode(html_string.encode()).decode()
-    href = f'<a href="data:text/html;base64,{b64}" download="{filename}">🗺️ Download Interactive Map</a>'
-    return st.markdown(href, unsafe_allow_html=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "🗺️ Download Interactive Map",
+            data=lambda: render_html().encode("utf-8"),
+            file_name=filename,
+            mime="text/html",
+            key="export_map_html",
+            on_click="ignore"
+        )
+    with col2:
+        st.download_button(
+            "🗜️ Download Map (gzip)",
+            # mtime=0 keeps the archive identical for identical maps
+            data=lambda: gzip.compress(render_html().encode("utf-8"), mtime=0),
+            file_name=f"{filename}.gz",
+            mime="application/gzip",
+            key="export_map_gzip",
+            on_click="ignore"
+        )
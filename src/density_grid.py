@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from pollutant_index import has_any
+from settings import DENSITY_GRID_LEVELS
+
+
+def build_density_grid(stations_gdf, cell_sizes=None):
+    """
+    Count stations per square grid cell at several resolutions.
+
+    Counts are kept per distinct pollutant bitmask so the grid can be filtered
+    by any pollutant selection without going back to the stations.
+
+    Args:
+        stations_gdf (geopandas.GeoDataFrame): Stations with a pollutant_mask column
+        cell_sizes (list): Cell sizes in degrees; defaults to DENSITY_GRID_LEVELS
+
+    Returns:
+        pandas.DataFrame: Columns cell_size, ix, iy, pollutant_mask and count
+    """
+    if cell_sizes is None:
+        cell_sizes = [size for _, _, size in DENSITY_GRID_LEVELS]
+    
+    columns = ["cell_size", "ix", "iy", "pollutant_mask", "count"]
+    if stations_gdf.empty or "pollutant_mask" not in stations_gdf.columns:
+        return pd.DataFrame(columns=columns)
+    
+    lon = stations_gdf.geometry.x.to_numpy()
+    lat = stations_gdf.geometry.y.to_numpy()
+    mask = stations_gdf["pollutant_mask"].to_numpy(dtype="int64")
+    valid = np.isfinite(lon) & np.isfinite(lat)
+    lon, lat, mask = lon[valid], lat[valid], mask[valid]
+    
+    levels = []
+    for size in cell_sizes:
+        cells = pd.DataFrame({
+            "cell_size": size,
+            "ix": np.floor(lon / size).astype("int64"),
+            "iy": np.floor(lat / size).astype("int64"),
+            "pollutant_mask": mask
+        })
+        levels.append(cells.groupby(["cell_size", "ix", "iy", "pollutant_mask"]).size().rename("count").reset_index())
+    return pd.concat(levels, ignore_index=True)[columns]
+
+
+def grid_cells(density_grid, cell_size, bits):
+    """
+    Station counts per cell for one resolution and pollutant selection.
+
+    Args:
+        density_grid (pandas.DataFrame): Output of `build_density_grid`
+        cell_size (float): Grid resolution in degrees
+        bits (int): Pollutant selection bitmask
+
+    Returns:
+        pandas.DataFrame: Columns lat, lon (cell centers) and count
+    """
+    level = density_grid[density_grid["cell_size"] == cell_size]
+    level = level[has_any(level["pollutant_mask"], bits)]
+    cells = level.groupby(["ix", "iy"])["count"].sum().reset_index()
+    cells["lat"] = (cells["iy"] + 0.5) * cell_size
+    cells["lon"] = (cells["ix"] + 0.5) * cell_size
+    return cells[["lat", "lon", "count"]]
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+from settings import PLOT_MAX_POINTS
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets point selection.
+
+    Keeps the first and last points and, from each of the `n_out - 2`
+    buckets in between, the point forming the largest triangle with the
+    previously kept point and the average of the next bucket, so peaks and
+    troughs survive.
+
+    Args:
+        x (numpy.ndarray): Monotonic x values as floats
+        y (numpy.ndarray): y values as floats, without NaNs
+        n_out (int): Number of points to keep (at least 3)
+
+    Returns:
+        numpy.ndarray: Sorted positions of the kept points
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    previous = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[stop:next_stop].mean() if next_stop > stop else x[-1]
+        next_y = y[stop:next_stop].mean() if next_stop > stop else y[-1]
+
+        bucket_x = x[start:stop]
+        bucket_y = y[start:stop]
+        area = np.abs(
+            (x[previous] - next_x) * (bucket_y - y[previous])
+            - (x[previous] - bucket_x) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+
+    return selected
+
+
+def minmax_indices(y, n_buckets):
+    """
+    Keep the minimum and maximum of each of `n_buckets` equal-count buckets.
+
+    Args:
+        y (numpy.ndarray): y values as floats, without NaNs
+        n_buckets (int): Number of buckets
+
+    Returns:
+        numpy.ndarray: Sorted positions of the kept points
+    """
+    n = len(y)
+    if 2 * n_buckets >= n:
+        return np.arange(n)
+
+    buckets = np.arange(n) * n_buckets // n
+    frame = pd.DataFrame({"y": y, "bucket": buckets})
+    grouped = frame.groupby("bucket")["y"]
+    return np.unique(np.concatenate([grouped.idxmin().to_numpy(), grouped.idxmax().to_numpy()]))
+
+
+def downsample_series(series, max_points=PLOT_MAX_POINTS, method="lttb"):
+    """
+    Reduce a datetime-indexed series to at most `max_points` points for plotting.
+
+    Missing values are dropped first. Only use the result for display;
+    statistics should be computed on the full-resolution data.
+
+    Args:
+        series (pandas.Series): Values with a DatetimeIndex
+        max_points (int): Maximum number of points to return
+        method (str): "lttb" or "minmax"
+
+    Returns:
+        pandas.Series: The selected points of `series`
+    """
+    series = series.dropna()
+    if len(series) <= max_points:
+        return series
+
+    y = series.to_numpy(dtype=float)
+    if method == "minmax":
+        positions = minmax_indices(y, max_points // 2)
+    else:
+        x = series.index.asi8.astype(float)
+        positions = lttb_indices(x, y, max_points)
+    return series.iloc[positions]
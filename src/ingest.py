@@ -0,0 +1,77 @@
+import json
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the standard library parser
+    orjson = None
+
+
+def parse_json(content):
+    """
+    Decode a JSON response body, using orjson when it is installed.
+
+    Args:
+        content (bytes): Raw response body
+
+    Returns:
+        dict or list: Decoded JSON
+
+    Raises:
+        ValueError: If the body is not valid JSON
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _point_coordinates(features):
+    """
+    Collect 2D point coordinates into an (n, 2) array, or None if any
+    feature is not a plain 2D point and needs the generic path.
+    """
+    try:
+        coords = [feature["geometry"]["coordinates"] for feature in features
+                  if feature["geometry"]["type"] == "Point"]
+    except (KeyError, TypeError):
+        return None
+    if len(coords) != len(features):
+        return None
+    try:
+        array = np.asarray(coords, dtype=float)
+    except ValueError:
+        return None
+    if array.ndim != 2 or array.shape[1] != 2:
+        return None
+    return array
+
+
+def features_to_geodataframe(features, crs=None):
+    """
+    Build a GeoDataFrame from GeoJSON features without per-feature shapely objects.
+
+    Produces the same frame as `GeoDataFrame.from_features`, but point
+    coordinates are gathered into NumPy arrays and turned into geometries in
+    bulk, and properties are loaded as columns in a single DataFrame
+    constructor call. Non-point geometries fall back to `from_features`.
+
+    Args:
+        features (list): GeoJSON feature dicts
+        crs: Coordinate reference system for the result
+
+    Returns:
+        geopandas.GeoDataFrame: One row per feature, geometry first then properties
+    """
+    if len(features) == 0:
+        return gpd.GeoDataFrame.from_features(features, crs=crs)
+
+    coords = _point_coordinates(features)
+    if coords is None:
+        return gpd.GeoDataFrame.from_features(features, crs=crs)
+
+    properties = pd.DataFrame([feature.get("properties") or {} for feature in features])
+    properties.insert(0, "geometry", gpd.points_from_xy(coords[:, 0], coords[:, 1]))
+    return gpd.GeoDataFrame(properties, geometry="geometry", crs=crs)
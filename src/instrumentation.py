@@ -0,0 +1,232 @@
+"""
+Spans, HTTP call records and cache counters for profiling dashboard reruns.
+
+Every event is emitted as a one-line JSON log record on this module's
+logger, so production logs can be collected and queried; set
+AQ_INSTRUMENTATION_LOG=1 to print them to stderr without configuring
+logging. Events raised while a `trace` is active (one per dashboard rerun)
+are also collected on it for the debug panel. Worker threads only see the
+trace when their task is wrapped with `in_context`.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from settings import INSTRUMENTATION_LOG
+
+logger = logging.getLogger(__name__)
+
+if INSTRUMENTATION_LOG:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_current_trace = contextvars.ContextVar("instrumentation_trace", default=None)
+_span_path = contextvars.ContextVar("instrumentation_span_path", default=())
+
+_cache_totals = {}
+_cache_totals_lock = threading.Lock()
+
+# Marks whether the innermost counted cache lookup of this thread ran its function
+_cache_local = threading.local()
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = None
+
+
+def rss_bytes():
+    """Resident memory of the process in bytes, or None where /proc is unavailable."""
+    if _PAGE_SIZE is None:
+        return None
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _emit(event, **fields):
+    trace = _current_trace.get()
+    record = {"event": event, "trace_id": trace.trace_id if trace else None, **fields}
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(record, default=str))
+    return record
+
+
+class Trace:
+    """Events collected over one dashboard rerun; safe to append to from worker threads."""
+
+    def __init__(self, name):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.started = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.http = []
+        self.cache = {}
+        self._lock = threading.Lock()
+
+    def add(self, kind, record):
+        with self._lock:
+            if kind == "cache":
+                counts = self.cache.setdefault(record["cache"], {"hits": 0, "misses": 0})
+                counts["hits"] += record["hits"]
+                counts["misses"] += record["misses"]
+            else:
+                getattr(self, kind).append(record)
+
+
+@contextmanager
+def trace(name):
+    """
+    Collect the spans, HTTP calls and cache lookups of a block, e.g. one rerun.
+
+    Yields:
+        Trace: The trace being collected; `duration` is set on exit
+    """
+    current = Trace(name)
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        current.duration = time.perf_counter() - current.started
+        _emit("trace", name=name, duration_ms=round(current.duration * 1000, 1),
+              spans=len(current.spans), http_calls=len(current.http))
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a named stage; spans opened inside it are recorded as its children.
+
+    Memory is the change in resident memory of the whole process over the
+    span, so concurrent sessions can blur it.
+    """
+    path = _span_path.get() + (name,)
+    token = _span_path.set(path)
+    trace_ = _current_trace.get()
+    rss_before = rss_bytes()
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        rss_after = rss_bytes()
+        _span_path.reset(token)
+        record = _emit(
+            "span", name="/".join(path), depth=len(path) - 1,
+            offset_ms=None if trace_ is None else round((started - trace_.started) * 1000, 1),
+            duration_ms=round(duration * 1000, 1),
+            rss_mb=None if rss_after is None else round(rss_after / 2 ** 20, 1),
+            rss_delta_mb=None if rss_after is None or rss_before is None else round((rss_after - rss_before) / 2 ** 20, 1),
+            error=error, **attributes
+        )
+        if trace_ is not None:
+            trace_.add("spans", record)
+
+
+def in_context(func):
+    """
+    Bind `func` to a copy of the caller's context, for `executor.submit`.
+
+    Tasks run this way report their spans and HTTP calls to the caller's trace.
+    """
+    return functools.partial(contextvars.copy_context().run, func)
+
+
+def record_http(client, method, url, status, elapsed, size, error=None):
+    """Record one HTTP call of an API client."""
+    record = _emit(
+        "http", client=client, method=method, url=url, status=status,
+        latency_ms=round(elapsed * 1000, 1), bytes=size, error=error,
+        span="/".join(_span_path.get()) or None
+    )
+    trace_ = _current_trace.get()
+    if trace_ is not None:
+        trace_.add("http", record)
+
+
+def http_hook(client):
+    """
+    A requests response hook recording latency (headers plus body) and body size.
+
+    Reads the body inside the hook, which only suits sessions that do not stream.
+    """
+    def record(response, *args, **kwargs):
+        started = time.perf_counter()
+        size = len(response.content)
+        elapsed = response.elapsed.total_seconds() + time.perf_counter() - started
+        record_http(client, response.request.method, response.url, response.status_code, elapsed, size)
+        return response
+    return record
+
+
+def record_cache(cache, hits=0, misses=0):
+    """Count the hits and misses of one or more lookups of a named cache."""
+    with _cache_totals_lock:
+        counts = _cache_totals.setdefault(cache, {"hits": 0, "misses": 0})
+        counts["hits"] += hits
+        counts["misses"] += misses
+    record = _emit("cache", cache=cache, hits=hits, misses=misses)
+    trace_ = _current_trace.get()
+    if trace_ is not None:
+        trace_.add("cache", record)
+
+
+def cache_totals():
+    """
+    Process-wide lookups of every named cache.
+
+    Returns:
+        dict: Cache name to {"hits": int, "misses": int}
+    """
+    with _cache_totals_lock:
+        return {name: dict(counts) for name, counts in _cache_totals.items()}
+
+
+def counted_cache(cache_decorator, name):
+    """
+    Apply a memoizing decorator such as `st.cache_data(...)` and count its hits and misses.
+
+    A call is a miss when the memoized function actually ran. The returned
+    function keeps the cache's `clear`.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def compute(*args, **kwargs):
+            _cache_local.ran = True
+            return func(*args, **kwargs)
+
+        cached = cache_decorator(compute)
+
+        @functools.wraps(func)
+        def lookup(*args, **kwargs):
+            # Saved and restored, since a cached function may look up another one
+            outer = getattr(_cache_local, "ran", False)
+            _cache_local.ran = False
+            try:
+                result = cached(*args, **kwargs)
+                record_cache(name, hits=int(not _cache_local.ran), misses=int(_cache_local.ran))
+                return result
+            finally:
+                _cache_local.ran = outer
+
+        lookup.clear = cached.clear
+        return lookup
+    return decorate
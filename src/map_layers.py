@@ -0,0 +1,268 @@
+import json
+
+import numpy as np
+import pandas as pd
+import folium
+from folium import plugins
+from branca.element import MacroElement
+from folium.template import Template
+
+from density_grid import grid_cells
+from instrumentation import span
+from pollutant_index import pollutant_bits, has_any, mask_codes
+from settings import MAP_FAST_RENDER_THRESHOLD, DENSITY_GRID_LEVELS
+
+# Builds markers and popups in the browser from the compact station table.
+# Rows are [lat, lon, color index, name, city, country index, pollutant mask].
+FAST_MARKER_CALLBACK = """(function () {
+    var colors = %(colors)s;
+    var countries = %(countries)s;
+    var pollutants = %(pollutants)s;
+    var escape = function (value) {
+        return String(value).replace(/[&<>"']/g, function (c) {
+            return {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"}[c];
+        });
+    };
+    var popup = function (row) {
+        var html = "<div style='min-width: 200px'><h4>" + escape(row[3]) + "</h4>" +
+            "<b>Location:</b> " + escape(row[4]) + ", " + escape(countries[row[5]]) + "<br>" +
+            "<b>Pollutants Measured:</b><br>";
+        for (var i = 0; i < pollutants.length; i++) {
+            if (row[6] & (1 << i)) {
+                html += "&bull; " + pollutants[i] + "<br>";
+            }
+        }
+        return html + "</div>";
+    };
+    return function (row) {
+        var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+            radius: 8, color: colors[row[2]], fill: true
+        });
+        marker.bindPopup(function () { return popup(row); }, {maxWidth: 300});
+        return marker;
+    };
+})()"""
+
+
+class ZoomLayerSwitch(MacroElement):
+    """
+    Show each layer only while the map zoom is within its [min_zoom, max_zoom] range.
+
+    Must be added to the map after the layers it controls.
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function () {
+            var map = {{ this._parent.get_name() }};
+            var ranges = [
+                {%- for layer, min_zoom, max_zoom in this.ranges %}
+                {layer: {{ layer.get_name() }}, min: {{ min_zoom }}, max: {{ max_zoom }}},
+                {%- endfor %}
+            ];
+            var update = function () {
+                var zoom = map.getZoom();
+                ranges.forEach(function (range) {
+                    var visible = zoom >= range.min && zoom <= range.max;
+                    if (visible && !map.hasLayer(range.layer)) {
+                        map.addLayer(range.layer);
+                    } else if (!visible && map.hasLayer(range.layer)) {
+                        map.removeLayer(range.layer);
+                    }
+                });
+            };
+            map.on("zoomend", update);
+            update();
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, ranges):
+        super().__init__()
+        self._name = "ZoomLayerSwitch"
+        self.ranges = ranges
+
+
+def marker_colors(stations_gdf, selected_pollutants, pollutant_info):
+    """
+    Color each station by the first selected pollutant it measures.
+
+    Args:
+        stations_gdf (geopandas.GeoDataFrame): Stations with a pollutant_mask column
+        selected_pollutants (list): Pollutant codes in selection order
+        pollutant_info (dict): Dictionary with pollutant metadata
+
+    Returns:
+        numpy.ndarray: One color name per station
+    """
+    codes = list(pollutant_info.keys())
+    colors = np.full(len(stations_gdf), "gray", dtype=object)
+    for p in reversed(selected_pollutants):
+        measures_p = has_any(stations_gdf['pollutant_mask'], pollutant_bits([p], codes))
+        colors[measures_p.to_numpy()] = pollutant_info[p]["color"]
+    return colors
+
+
+def add_circle_markers(parent, stations_gdf, colors, pollutant_info, country_names):
+    """Add one CircleMarker with a popup per station to `parent` (a map, cluster or feature group)."""
+    codes = list(pollutant_info.keys())
+    for (_, row), color in zip(stations_gdf.iterrows(), colors):
+        pollutants = mask_codes(row['pollutant_mask'], codes)
+        popup_content = f"""
+        <div style='min-width: 200px'>
+            <h4>{row['name']}</h4>
+            <b>Location:</b> {row['city_name']}, {country_names.get(row['country_id'], row['country_id'])}<br>
+            <b>Pollutants Measured:</b><br>
+        """
+        for p in pollutants:
+            popup_content += f"• {pollutant_info[p]['name']} ({pollutant_info[p]['unit']})<br>"
+        popup_content += "</div>"
+        
+        folium.CircleMarker(
+            location=[row.geometry.y, row.geometry.x],
+            radius=8,
+            color=color,
+            fill=True,
+            popup=folium.Popup(popup_content, max_width=300)
+        ).add_to(parent)
+
+
+def station_table(stations_gdf, colors, country_names):
+    """
+    Encode stations as compact rows for client-side rendering.
+
+    Repeated values (colors, countries) are stored once in lookup tables and
+    referenced by index; pollutants are sent as the station bitmask.
+
+    Returns:
+        tuple: (list of rows, list of colors, list of country names)
+    """
+    color_codes, color_table = pd.factorize(pd.Series(colors, dtype=object))
+    country_ids = stations_gdf['country_id'].astype(object).where(stations_gdf['country_id'].notna(), "")
+    country_codes, country_table = pd.factorize(country_ids)
+    country_table = [country_names.get(c, c) for c in country_table]
+
+    rows = list(zip(
+        np.round(stations_gdf.geometry.y.to_numpy(), 5).tolist(),
+        np.round(stations_gdf.geometry.x.to_numpy(), 5).tolist(),
+        color_codes.tolist(),
+        stations_gdf['name'].astype(object).where(stations_gdf['name'].notna(), "").tolist(),
+        stations_gdf['city_name'].astype(object).where(stations_gdf['city_name'].notna(), "").tolist(),
+        country_codes.tolist(),
+        stations_gdf['pollutant_mask'].to_numpy(dtype="int64").tolist()
+    ))
+    return rows, list(color_table), country_table
+
+
+def add_fast_station_markers(m, stations_gdf, colors, pollutant_info, country_names):
+    """
+    Add stations as a client-side FastMarkerCluster.
+
+    Only a compact property table is embedded in the page; markers are created
+    in the browser and popups are rendered from one shared template when they
+    are opened.
+
+    Returns:
+        folium.plugins.FastMarkerCluster: The added marker layer
+    """
+    rows, color_table, country_table = station_table(stations_gdf, colors, country_names)
+    callback = FAST_MARKER_CALLBACK % {
+        "colors": json.dumps(color_table),
+        "countries": json.dumps(country_table),
+        "pollutants": json.dumps([f"{info['name']} ({info['unit']})" for info in pollutant_info.values()])
+    }
+    cluster = plugins.FastMarkerCluster([], callback=callback, chunkedLoading=True)
+    # Rows are already plain Python values; skip FastMarkerCluster's per-row validation
+    cluster.data = rows
+    cluster.add_to(m)
+    return cluster
+
+
+def add_density_layers(m, density_grid, bits):
+    """
+    Add one heatmap layer per density grid level.
+
+    Returns:
+        list: (layer, min_zoom, max_zoom) for each level
+    """
+    ranges = []
+    for min_zoom, max_zoom, cell_size in DENSITY_GRID_LEVELS:
+        cells = grid_cells(density_grid, cell_size, bits)
+        # Log-scale the counts so a few dense cities do not wash out everything else
+        weights = np.log1p(cells["count"].to_numpy(dtype=float))
+        if len(weights) and weights.max() > 0:
+            weights = weights / weights.max()
+        # Roughly one cell wide on screen at the level's lowest zoom
+        radius = max(8, min(40, int(cell_size * 256 * 2 ** min_zoom / 360)))
+        layer = plugins.HeatMap(
+            list(zip(cells["lat"].tolist(), cells["lon"].tolist(), weights.tolist())),
+            name=f"Station density ({cell_size}°)",
+            radius=radius,
+            max_zoom=max_zoom,
+            control=False
+        )
+        layer.add_to(m)
+        ranges.append((layer, min_zoom, max_zoom))
+    return ranges
+
+
+def build_station_map(stations_gdf, selected_pollutants, pollutant_info, country_names,
+                      density_grid=None, fast_threshold=MAP_FAST_RENDER_THRESHOLD):
+    """
+    Build the station network map, with markers and popups rendered client-side.
+
+    Large networks are shown as a density heatmap at low zoom levels, when a
+    precomputed density grid is provided, and as individual markers only once
+    zoomed in past the density levels.
+
+    Args:
+        stations_gdf (geopandas.GeoDataFrame): Stations to show, with a pollutant_mask column
+        selected_pollutants (list): Pollutant codes in selection order
+        pollutant_info (dict): Dictionary with pollutant metadata
+        country_names (dict): ISO country code to display name
+        density_grid (pandas.DataFrame): Output of `density_grid.build_density_grid`
+        fast_threshold (int): Station count above which the density mode is used
+
+    Returns:
+        folium.Map: The station map
+    """
+    m = folium.Map(location=[20, 0], zoom_start=2)
+    colors = marker_colors(stations_gdf, selected_pollutants, pollutant_info)
+    
+    with span("markers", stations=len(stations_gdf)):
+        markers = add_fast_station_markers(m, stations_gdf, colors, pollutant_info, country_names)
+    if len(stations_gdf) > fast_threshold and density_grid is not None:
+        ranges = add_density_layers(m, density_grid, pollutant_bits(selected_pollutants, list(pollutant_info.keys())))
+        ranges.append((markers, DENSITY_GRID_LEVELS[-1][1] + 1, 99))
+        ZoomLayerSwitch(ranges).add_to(m)
+    
+    return m
+
+
+def render_map_html(m):
+    """
+    Render a map as a standalone HTML document, for display and download alike.
+
+    Returns:
+        str: The HTML document
+    """
+    return m.get_root().render()
+
+
+def build_viewport_layer(stations_gdf, selected_pollutants, pollutant_info, country_names,
+                         max_markers=MAP_FAST_RENDER_THRESHOLD):
+    """
+    Build a feature group with the stations inside the current map viewport.
+
+    Meant to be swapped into an interactive map on every pan or zoom, so only
+    core Leaflet markers are used and at most `max_markers` stations, spread
+    evenly over the viewport's stations, are drawn.
+
+    Returns:
+        tuple: (folium.FeatureGroup, number of stations drawn)
+    """
+    if len(stations_gdf) > max_markers:
+        stations_gdf = stations_gdf.iloc[np.linspace(0, len(stations_gdf) - 1, max_markers).astype(int)]
+    layer = folium.FeatureGroup(name="Stations")
+    colors = marker_colors(stations_gdf, selected_pollutants, pollutant_info)
+    add_circle_markers(layer, stations_gdf, colors, pollutant_info, country_names)
+    return layer, len(stations_gdf)
@@ -0,0 +1,199 @@
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from instrumentation import record_cache
+from settings import CACHE_DIR, MEASUREMENT_FINALIZE_HOURS
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; series are then only locked within the process
+    fcntl = None
+
+MEASUREMENT_DIR = CACHE_DIR / "measurements"
+
+_series_locks = {}
+_series_locks_guard = threading.Lock()
+
+
+def partition_dir(station_id, pollutant):
+    """Hive-style partition directory for a station/pollutant series."""
+    return MEASUREMENT_DIR / f"station={quote(str(station_id), safe='')}" / f"pollutant={quote(pollutant, safe='')}"
+
+
+@contextmanager
+def series_lock(station_id, pollutant):
+    """
+    Hold the update lock of a series, for read-modify-write cycles of its
+    derived files (rollups, running statistics).
+
+    Serializes threads of this process through a per-series lock and other
+    processes (sessions of another server, report workers) through an
+    exclusive lock on a file in the partition directory. Not reentrant.
+    """
+    directory = partition_dir(station_id, pollutant)
+    with _series_locks_guard:
+        thread_lock = _series_locks.setdefault(directory, threading.Lock())
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        # Dot files are skipped by dataset scans of the partition
+        with open(directory / ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _day_path(station_id, pollutant, day, suffix="parquet"):
+    return partition_dir(station_id, pollutant) / f"date={day.isoformat()}.{suffix}"
+
+
+def _is_final(path, day):
+    """
+    A day is final once its file was written after the day ended plus the
+    finalization lag; data written earlier may still be revised upstream.
+    """
+    try:
+        written_at = datetime.fromtimestamp(path.stat().st_mtime)
+    except OSError:
+        return False
+    day_end = datetime.combine(day + timedelta(days=1), datetime.min.time())
+    return written_at >= day_end + timedelta(hours=MEASUREMENT_FINALIZE_HOURS)
+
+
+def missing_days(station_id, pollutant, days):
+    """
+    Days of a series that are missing or not yet final, without reading any data.
+
+    Args:
+        station_id (str): The ID of the monitoring station
+        pollutant (str): The pollutant code (pm10, pm25, etc.)
+        days (list): datetime.date objects to check
+
+    Returns:
+        list: Days that must be fetched
+    """
+    missing = [
+        day for day in days
+        if not _is_final(_day_path(station_id, pollutant, day, suffix="empty"), day)
+        and not _is_final(_day_path(station_id, pollutant, day), day)
+    ]
+    record_cache("measurement_days", hits=len(days) - len(missing), misses=len(missing))
+    return missing
+
+
+def read_days(station_id, pollutant, days):
+    """
+    Read the finalized days of a series from the local store.
+
+    Args:
+        station_id (str): The ID of the monitoring station
+        pollutant (str): The pollutant code (pm10, pm25, etc.)
+        days (list): datetime.date objects to read
+
+    Returns:
+        tuple: (pandas.DataFrame of cached measurements, list of days that
+        are missing or not yet final and must be fetched)
+    """
+    cached = []
+    missing = []
+    for day in days:
+        data_path = _day_path(station_id, pollutant, day)
+        empty_path = _day_path(station_id, pollutant, day, suffix="empty")
+        if _is_final(empty_path, day):
+            continue
+        if _is_final(data_path, day):
+            cached.append((day, data_path))
+        else:
+            missing.append(day)
+
+    record_cache("measurement_days", hits=len(cached), misses=len(missing))
+    if not cached:
+        return pd.DataFrame(), missing
+
+    try:
+        # One multi-file scan is much faster than opening each day separately
+        table = ds.dataset([str(path) for _, path in cached], format="parquet").to_table()
+        return table.to_pandas(), missing
+    except (OSError, ValueError, TypeError):
+        pass
+
+    # Days with diverging schemas or unreadable files are read one by one
+    frames = []
+    for day, path in cached:
+        try:
+            frames.append(pd.read_parquet(path))
+        except (OSError, ValueError):
+            missing.append(day)
+    missing.sort()
+    if not frames:
+        return pd.DataFrame(), missing
+    return pd.concat(frames), missing
+
+
+def write_days(station_id, pollutant, df, days):
+    """
+    Store fetched measurements as one Parquet file per day.
+
+    Every day in `days` is written, even when the API returned nothing for it,
+    so finalized empty days are not refetched.
+
+    Args:
+        station_id (str): The ID of the monitoring station
+        pollutant (str): The pollutant code (pm10, pm25, etc.)
+        df (pandas.DataFrame): Measurements with a datetime index
+        days (list): datetime.date objects covered by the fetch
+    """
+    directory = partition_dir(station_id, pollutant)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    by_day = {}
+    if not df.empty:
+        by_day = {day: group for day, group in df.groupby(df.index.date)}
+
+    for day in days:
+        data_path = _day_path(station_id, pollutant, day)
+        empty_path = _day_path(station_id, pollutant, day, suffix="empty")
+        day_df = by_day.get(day)
+        # Threads of one process may write the same day: each gets its own temp file
+        tmp_path = data_path.with_name(f"{data_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            if day_df is None or day_df.empty:
+                empty_path.touch()
+                data_path.unlink(missing_ok=True)
+                continue
+            day_df.to_parquet(tmp_path)
+            os.replace(tmp_path, data_path)
+            empty_path.unlink(missing_ok=True)
+        except (OSError, ValueError, TypeError):
+            # Caching is best effort; the day is simply fetched again next time
+            tmp_path.unlink(missing_ok=True)
+            continue
+
+
+def contiguous_ranges(days):
+    """
+    Group sorted dates into contiguous (first_day, last_day) ranges.
+
+    Args:
+        days (list): Sorted datetime.date objects
+
+    Returns:
+        list: (first_day, last_day) tuples
+    """
+    ranges = []
+    for day in days:
+        if ranges and day - ranges[-1][1] == timedelta(days=1):
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
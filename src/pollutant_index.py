@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+
+def pollutant_bits(pollutants, codes):
+    """
+    Combine pollutant codes into a single bitmask.
+
+    Args:
+        pollutants (list): Pollutant codes to set
+        codes (list): All known pollutant codes; position i maps to bit i
+
+    Returns:
+        int: Bitmask with one bit set per known pollutant in `pollutants`
+    """
+    bits = 0
+    for i, code in enumerate(codes):
+        if code in pollutants:
+            bits |= 1 << i
+    return bits
+
+
+def build_pollutant_mask(pollutants, codes):
+    """
+    Encode a column of pollutant lists as one integer bitmask per station.
+
+    Args:
+        pollutants (pandas.Series): Lists of pollutant codes (non-list values count as none)
+        codes (list): All known pollutant codes; position i maps to bit i
+
+    Returns:
+        pandas.Series: int64 bitmask aligned with `pollutants`
+    """
+    lists = pollutants.where(pollutants.map(lambda x: isinstance(x, list)), None).reset_index(drop=True)
+    exploded = lists.explode()
+    pairs = pd.DataFrame({
+        "station": exploded.index,
+        "bit": exploded.map({code: 1 << i for i, code in enumerate(codes)}).to_numpy()
+    }).dropna()
+    # A code listed twice must not carry into the next bit
+    pairs = pairs.drop_duplicates()
+    mask = pairs["bit"].astype("int64").groupby(pairs["station"]).sum()
+    mask = mask.reindex(range(len(pollutants)), fill_value=0).to_numpy(dtype="int64")
+    return pd.Series(mask, index=pollutants.index, name="pollutant_mask")
+
+
+def mask_codes(mask, codes):
+    """
+    Decode one station bitmask back into its pollutant codes.
+
+    Args:
+        mask (int): Station bitmask
+        codes (list): All known pollutant codes; position i maps to bit i
+
+    Returns:
+        list: Codes whose bit is set, in `codes` order
+    """
+    return [code for i, code in enumerate(codes) if int(mask) >> i & 1]
+
+
+def has_any(mask, bits):
+    """
+    Boolean Series marking stations that measure at least one pollutant in `bits`.
+    """
+    return (mask & bits) != 0
+
+
+def pollutant_matrix(mask, codes):
+    """
+    Expand bitmasks into a station × pollutant boolean matrix.
+
+    Args:
+        mask (pandas.Series): Station bitmasks from `build_pollutant_mask`
+        codes (list): All known pollutant codes; position i maps to bit i
+
+    Returns:
+        pandas.DataFrame: One boolean column per pollutant code, indexed like `mask`
+    """
+    shifts = np.arange(len(codes), dtype="int64")
+    values = (mask.to_numpy(dtype="int64")[:, None] >> shifts) & 1
+    return pd.DataFrame(values.astype(bool), index=mask.index, columns=list(codes))
@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+
+# Expected spacing of measurements; longer intervals are reported as gaps
+EXPECTED_FREQ = "1h"
+
+# Consecutive identical values, in hours, before a run is reported as a flatline
+FLATLINE_MIN_HOURS = 6
+
+# Trailing window (hours) and modified z-score threshold of the spike detector
+# (Iglewicz & Hoaglin recommend 3.5)
+SPIKE_WINDOW_HOURS = 24
+SPIKE_THRESHOLD = 3.5
+
+SERIES_KEYS = ["station_id", "pollutant"]
+
+
+def _prepare(measurements):
+    df = measurements[SERIES_KEYS + ["value"]].copy()
+    df["value"] = pd.to_numeric(df["value"], errors="coerce")
+    df.index.name = "datetime"
+    df = df.reset_index().dropna(subset=["value"])
+    df = df.sort_values(SERIES_KEYS + ["datetime"], kind="stable").reset_index(drop=True)
+    # Marks the first row of every series, so per-series differences can be
+    # taken on the flat arrays
+    df["first"] = ~df.duplicated(SERIES_KEYS)
+    return df
+
+
+def detect_gaps(measurements, freq=EXPECTED_FREQ):
+    """
+    Find intervals without measurements inside each series.
+
+    Args:
+        measurements (pandas.DataFrame): Long frame with station_id, pollutant
+            and value columns and a DatetimeIndex
+        freq (str): Expected spacing of measurements
+
+    Returns:
+        pandas.DataFrame: station_id, pollutant, start and end of the missing
+        interval and missing (number of expected measurements absent)
+    """
+    return _gaps(_prepare(measurements), freq)
+
+
+def _gaps(df, freq=EXPECTED_FREQ):
+    step = pd.Timedelta(freq)
+    delta = df["datetime"].diff()
+    is_gap = (~df["first"]) & (delta > step)
+    gaps = df.loc[is_gap, SERIES_KEYS].copy()
+    gaps["start"] = df["datetime"].shift(1)[is_gap] + step
+    gaps["end"] = df.loc[is_gap, "datetime"] - step
+    gaps["missing"] = (delta[is_gap] // step - 1).astype("int64")
+    return gaps.reset_index(drop=True)
+
+
+def detect_flatlines(measurements, min_hours=FLATLINE_MIN_HOURS, freq=EXPECTED_FREQ):
+    """
+    Find runs of identical consecutive values, typical of stuck sensors.
+
+    A gap in the series ends a run.
+
+    Args:
+        measurements (pandas.DataFrame): Long frame with station_id, pollutant
+            and value columns and a DatetimeIndex
+        min_hours (int): Minimum run length to report
+        freq (str): Expected spacing of measurements
+
+    Returns:
+        pandas.DataFrame: station_id, pollutant, start, end, length and value of each run
+    """
+    return _flatlines(_prepare(measurements), min_hours, freq)
+
+
+def _flatlines(df, min_hours=FLATLINE_MIN_HOURS, freq=EXPECTED_FREQ):
+    starts_run = (
+        df["first"].to_numpy()
+        | (df["value"].diff().to_numpy() != 0)
+        | (df["datetime"].diff().to_numpy() > pd.Timedelta(freq).to_timedelta64())
+    )
+    runs = df.assign(run=np.cumsum(starts_run)).groupby("run", sort=False).agg(
+        station_id=("station_id", "first"),
+        pollutant=("pollutant", "first"),
+        start=("datetime", "first"),
+        end=("datetime", "last"),
+        length=("value", "size"),
+        value=("value", "first")
+    )
+    return runs[runs["length"] >= min_hours].reset_index(drop=True)
+
+
+def detect_spikes(measurements, window_hours=SPIKE_WINDOW_HOURS, threshold=SPIKE_THRESHOLD):
+    """
+    Flag values far from their trailing rolling median.
+
+    Uses the modified z-score 0.6745 * (x - median) / MAD over the trailing
+    window, which, unlike a mean/std z-score, is not inflated by the spike
+    itself.
+
+    Args:
+        measurements (pandas.DataFrame): Long frame with station_id, pollutant
+            and value columns and a DatetimeIndex
+        window_hours (int): Trailing window length in hours
+        threshold (float): Modified z-score above which a value is a spike
+
+    Returns:
+        pandas.DataFrame: station_id, pollutant, datetime, value, median and score of each spike
+    """
+    return _spikes(_prepare(measurements), window_hours, threshold)
+
+
+def _spikes(df, window_hours=SPIKE_WINDOW_HOURS, threshold=SPIKE_THRESHOLD):
+    df = df.set_index("datetime")
+    window = f"{window_hours}h"
+    min_periods = max(3, window_hours // 2)
+    grouped = df.groupby(SERIES_KEYS, sort=False)["value"]
+    median = grouped.rolling(window, min_periods=min_periods).median().to_numpy()
+    df = df.assign(deviation=np.abs(df["value"].to_numpy() - median))
+    mad = (
+        df.groupby(SERIES_KEYS, sort=False)["deviation"]
+        .rolling(window, min_periods=min_periods).median().to_numpy()
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        score = 0.6745 * (df["value"].to_numpy() - median) / mad
+    # A flat window has a MAD of 0; any deviation from it is a spike
+    score = np.where((mad == 0) & (df["deviation"].to_numpy() > 0), np.inf, score)
+    is_spike = np.abs(np.nan_to_num(score, nan=0.0)) > threshold
+
+    spikes = df.loc[is_spike, SERIES_KEYS + ["value"]].reset_index()
+    spikes["median"] = median[is_spike]
+    spikes["score"] = score[is_spike]
+    return spikes
+
+
+def completeness(measurements, start, end, freq=EXPECTED_FREQ):
+    """
+    Share of expected measurements present per series.
+
+    Args:
+        measurements (pandas.DataFrame): Long frame with station_id, pollutant
+            and value columns and a DatetimeIndex
+        start (datetime-like): Start of the scanned window
+        end (datetime-like): End of the scanned window
+        freq (str): Expected spacing of measurements
+
+    Returns:
+        pandas.DataFrame: Indexed by (station_id, pollutant) with observed,
+        expected and completeness columns
+    """
+    return _completeness(_prepare(measurements), start, end, freq)
+
+
+def _completeness(df, start, end, freq=EXPECTED_FREQ):
+    expected = max(int((pd.Timestamp(end) - pd.Timestamp(start)) / pd.Timedelta(freq)) + 1, 1)
+    slots = df["datetime"].dt.floor(freq)
+    observed = df.assign(slot=slots).drop_duplicates(SERIES_KEYS + ["slot"]).groupby(SERIES_KEYS).size()
+    result = observed.rename("observed").to_frame()
+    result["expected"] = expected
+    result["completeness"] = (result["observed"] / expected).clip(upper=1.0)
+    return result
+
+
+def scan_quality(measurements, start, end):
+    """
+    Run every detector over a selection and summarize per series.
+
+    Args:
+        measurements (pandas.DataFrame): Long frame with station_id, pollutant
+            and value columns and a DatetimeIndex
+        start (datetime-like): Start of the scanned window
+        end (datetime-like): End of the scanned window
+
+    Returns:
+        tuple: (summary DataFrame indexed by (station_id, pollutant) with
+        completeness, gaps, longest_gap_hours, flatline_hours and spikes;
+        dict of the detailed gaps, flatlines and spikes frames)
+    """
+    df = _prepare(measurements)
+    details = {
+        "gaps": _gaps(df),
+        "flatlines": _flatlines(df),
+        "spikes": _spikes(df)
+    }
+    summary = _completeness(df, start, end)
+    gaps = details["gaps"].groupby(SERIES_KEYS)["missing"]
+    summary["gaps"] = gaps.size()
+    summary["longest_gap_hours"] = gaps.max()
+    summary["flatline_hours"] = details["flatlines"].groupby(SERIES_KEYS)["length"].sum()
+    summary["spikes"] = details["spikes"].groupby(SERIES_KEYS).size()
+    counts = ["gaps", "longest_gap_hours", "flatline_hours", "spikes"]
+    summary[counts] = summary[counts].fillna(0).astype("int64")
+    return summary, details
@@ -0,0 +1,264 @@
+"""
+Headless batch reports for the station network.
+
+Runs the dashboard's station, coverage, distribution and time series
+computations without Streamlit, one report scope (region or country) per
+worker process, and writes Parquet tables plus an HTML report per scope:
+
+    python src/reports.py --out reports
+    python src/reports.py --regions Asia Europe --per-country --series-days 7
+"""
+import argparse
+import html
+import logging
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import plotly.express as px
+
+from analysis import pollutant_coverage, country_distribution, city_distribution, pollutant_distribution
+from catalog import get_pollutant_info, get_regions, get_country_codes, load_catalog
+from quality import scan_quality
+from pollutant_index import mask_codes
+from series_loader import fetch_many_historical, stack_series, summarize_aqi, summarize_rollup
+from settings import REPORT_WORKERS, REPORT_MAX_SERIES, REPORT_SERIES_DAYS
+
+logger = logging.getLogger(__name__)
+
+
+def _slug(name):
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def coverage_table(stations_gdf, pollutant_info):
+    """Stations measuring each pollutant, with their share of the catalog."""
+    codes = list(pollutant_info.keys())
+    counts = [int(pollutant_coverage(stations_gdf, [code], codes).sum()) for code in codes]
+    coverage = pd.DataFrame({
+        "Pollutant": [pollutant_info[code]["name"] for code in codes],
+        "Station Count": counts
+    })
+    coverage["Share"] = coverage["Station Count"] / len(stations_gdf) if len(stations_gdf) else 0.0
+    return coverage
+
+
+def series_tables(stations_gdf, pollutant_info, days, max_series):
+    """
+    Load hourly series for up to `max_series` station/pollutant pairs and
+    summarize their statistics, AQI, exceedances and data quality.
+
+    Returns:
+        dict: Table name to DataFrame (empty if nothing could be loaded)
+    """
+    codes = list(pollutant_info.keys())
+    # Every station left measures at least one pollutant, so `max_series` stations are enough
+    stations = stations_gdf[stations_gdf["id"].notna() & (stations_gdf["pollutant_mask"] != 0)]
+    stations = stations.sort_values("id").head(max_series)
+    names = stations["name"].astype(object)
+    names = names.where(names.notna() & (names != ""), stations["id"])
+    labels = {
+        (station_id, pollutant): name
+        for station_id, mask, name in zip(stations["id"], stations["pollutant_mask"], names)
+        for pollutant in mask_codes(mask, codes)
+    }
+    series = list(labels)[:max_series]
+    labels = {key: labels[key] for key in series}
+
+    frames, errors = fetch_many_historical(series, days=days, level="hourly")
+    for (station_id, pollutant), error in errors.items():
+        logger.warning("Could not fully load %s for station %s: %s", pollutant, station_id, error)
+    frames = {key: df for key, df in frames.items() if not df.empty}
+    if not frames:
+        return {}
+
+    statistics = pd.DataFrame(
+        [dict(station_id=key[0], pollutant=key[1], station=labels[key], **summarize_rollup(df))
+         for key, df in frames.items()]
+    )
+    end = pd.Timestamp.now(tz="UTC").floor("h")
+    quality, _ = scan_quality(stack_series(frames), end - pd.Timedelta(days=days), end)
+    aqi_summary, exceedances = summarize_aqi(frames, labels)
+    return {
+        "series_statistics": statistics.merge(
+            quality.drop(columns="expected").reset_index(), on=["station_id", "pollutant"], how="left"
+        ),
+        "series_aqi": aqi_summary.reset_index(),
+        "series_exceedances": exceedances
+    }
+
+
+def render_html(title, tables, figures):
+    """Assemble a standalone HTML report from plotly figures and tables."""
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>",
+        f"<title>{html.escape(title)}</title>",
+        "<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse}"
+        "td,th{border:1px solid #ccc;padding:2px 6px}</style></head><body>",
+        f"<h1>{html.escape(title)}</h1>",
+        f"<p>Generated {datetime.now():%Y-%m-%d %H:%M}</p>"
+    ]
+    for index, fig in enumerate(figures):
+        parts.append(fig.to_html(full_html=False, include_plotlyjs="cdn" if index == 0 else False))
+    for name, table in tables.items():
+        parts.append(f"<h2>{html.escape(name.replace('_', ' ').capitalize())}</h2>")
+        parts.append(table.to_html(index=False, float_format=lambda v: f"{v:.2f}", na_rep=""))
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+def build_report(name, countries, out_dir, series_days=REPORT_SERIES_DAYS, max_series=REPORT_MAX_SERIES):
+    """
+    Compute and write the report of one scope. Runs in a worker process.
+
+    Args:
+        name (str): Report scope name (region or country)
+        countries (list): ISO country codes of the scope
+        out_dir (str): Root output directory
+        series_days (int): Window of the time series summaries; 0 skips them
+        max_series (int): Maximum station/pollutant series loaded
+
+    Returns:
+        dict: Scope name, output directory, station count and failed countries
+    """
+    pollutant_info = get_pollutant_info()
+    country_names = get_country_codes()
+    report_dir = Path(out_dir) / _slug(name)
+    report_dir.mkdir(parents=True, exist_ok=True)
+
+    stations_gdf, failed = load_catalog(countries)
+    tables = {}
+    figures = []
+    if not stations_gdf.empty:
+        stations_gdf.to_parquet(report_dir / "stations.parquet", index=False)
+
+        tables["pollutant_coverage"] = coverage_table(stations_gdf, pollutant_info)
+
+        country_data = country_distribution(stations_gdf, country_names)
+        tables["country_distribution"] = country_data
+        figures.append(px.bar(
+            country_data, x="Country", y="Station Count", title="Monitoring Stations by Country",
+            color="Station Count", color_continuous_scale="Viridis"
+        ))
+
+        city_frames = [
+            city_distribution(stations_gdf, code).assign(Country=country_names.get(code, code))
+            for code in stations_gdf["country_id"].dropna().unique()
+        ]
+        # Stations without a country leave nothing to break down by city
+        city_data = pd.concat(city_frames, ignore_index=True) if city_frames else pd.DataFrame(
+            {"City": pd.Series(dtype=object), "Station Count": pd.Series(dtype="int64"), "Country": pd.Series(dtype=object)}
+        )
+        tables["city_distribution"] = city_data
+        if not city_data.empty:
+            figures.append(px.treemap(
+                city_data, path=["Country", "City"], values="Station Count",
+                title="Monitoring Station Distribution by City"
+            ))
+
+        pollutant_df = pollutant_distribution(stations_gdf, pollutant_info, country_names)
+        tables["pollutant_distribution"] = pollutant_df
+        figures.append(px.bar(
+            pollutant_df, x="Country", y="Station Count", color="Pollutant", barmode="group",
+            title="Pollutant Measurement Capabilities by Country"
+        ))
+
+        if series_days > 0:
+            tables.update(series_tables(stations_gdf, pollutant_info, series_days, max_series))
+
+    for table_name, table in tables.items():
+        table.to_parquet(report_dir / f"{table_name}.parquet", index=False)
+    (report_dir / "report.html").write_text(render_html(f"{name} Air Quality Network Report", tables, figures), encoding="utf-8")
+
+    return {"name": name, "dir": report_dir.name, "stations": len(stations_gdf), "failed": failed}
+
+
+def report_scopes(regions=None, per_country=False):
+    """
+    Report scopes from get_regions(): one per region, or one per country.
+
+    Returns:
+        dict: Scope name to list of ISO country codes
+    """
+    all_regions = get_regions()
+    selected = {name: codes for name, codes in all_regions.items() if not regions or name in regions}
+    if not per_country:
+        return selected
+    country_names = get_country_codes()
+    return {
+        country_names.get(code, code): [code]
+        for codes in selected.values()
+        for code in codes
+    }
+
+
+def write_index(out_dir, results):
+    rows = "".join(
+        f"<tr><td><a href='{html.escape(r['dir'])}/report.html'>{html.escape(r['name'])}</a></td>"
+        f"<td>{r['stations']}</td><td>{html.escape(', '.join(sorted(r['failed'])))}</td></tr>"
+        for r in sorted(results, key=lambda r: r["name"])
+    )
+    Path(out_dir, "index.html").write_text(
+        "<!DOCTYPE html><html><head><meta charset='utf-8'><title>Air Quality Reports</title></head><body>"
+        "<h1>Air Quality Reports</h1><table><tr><th>Scope</th><th>Stations</th><th>Failed countries</th></tr>"
+        f"{rows}</table></body></html>",
+        encoding="utf-8"
+    )
+
+
+def run_reports(out_dir, scopes, series_days=REPORT_SERIES_DAYS, max_series=REPORT_MAX_SERIES,
+                workers=REPORT_WORKERS):
+    """
+    Build every scope's report on a process pool and write an index page.
+
+    Returns:
+        tuple: (list of result dicts, dict mapping scope names to exceptions)
+    """
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    results = []
+    errors = {}
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(scopes)))) as executor:
+        futures = {
+            executor.submit(build_report, name, countries, str(out_dir), series_days, max_series): name
+            for name, countries in scopes.items()
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results.append(future.result())
+            except Exception as e:
+                errors[name] = e
+                logger.error("Report for %s failed: %s", name, e)
+    write_index(out_dir, results)
+    return results, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate air quality network reports without Streamlit.")
+    parser.add_argument("--out", default="reports", help="Output directory")
+    parser.add_argument("--regions", nargs="*", help="Regions to include (default: all)")
+    parser.add_argument("--per-country", action="store_true", help="One report per country instead of per region")
+    parser.add_argument("--series-days", type=int, default=REPORT_SERIES_DAYS,
+                        help="Days of hourly data summarized per series; 0 skips time series")
+    parser.add_argument("--max-series", type=int, default=REPORT_MAX_SERIES,
+                        help="Maximum station/pollutant series per report")
+    parser.add_argument("--workers", type=int, default=REPORT_WORKERS, help="Worker processes")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    scopes = report_scopes(args.regions, args.per_country)
+    if not scopes:
+        parser.error("no matching regions")
+
+    results, errors = run_reports(args.out, scopes, args.series_days, args.max_series, args.workers)
+    for result in sorted(results, key=lambda r: r["name"]):
+        failed = f", failed: {', '.join(sorted(result['failed']))}" if result["failed"] else ""
+        logger.info("%s: %d stations%s", result["name"], result["stations"], failed)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+import os
+import threading
+
+import pandas as pd
+
+from measurement_store import partition_dir, series_lock
+from settings import ROLLUP_MIN_POINTS
+
+# Finest to coarsest. `period` is the matching period alias, `days` the
+# approximate span of one bucket and `rolling` the moving-average window (in
+# buckets) and label used when plotting.
+ROLLUP_LEVELS = {
+    "hourly": {"freq": "1h", "period": "h", "days": 1 / 24, "rolling": (24, "24-hour Moving Average")},
+    "daily": {"freq": "1D", "period": "D", "days": 1, "rolling": (7, "7-day Moving Average")},
+    "weekly": {"freq": "W", "period": "W", "days": 7, "rolling": (4, "4-week Moving Average")},
+    "monthly": {"freq": "MS", "period": "M", "days": 30.4, "rolling": (3, "3-month Moving Average")}
+}
+
+ROLLUP_COLUMNS = ["value", "min", "max", "count"]
+
+
+def _rollup_path(station_id, pollutant, level):
+    return partition_dir(station_id, pollutant) / f"rollup={level}.parquet"
+
+
+def _to_utc(index):
+    if index.tz is None:
+        return index.tz_localize("UTC")
+    return index.tz_convert("UTC")
+
+
+def _empty_rollup():
+    return pd.DataFrame(
+        {column: pd.Series(dtype="float64") for column in ROLLUP_COLUMNS},
+        index=pd.DatetimeIndex([], tz="UTC", name="datetime")
+    )
+
+
+def aggregate_values(values, freq):
+    """
+    Aggregate raw measurements into mean/min/max/count buckets.
+
+    Args:
+        values (pandas.Series): Raw values with a DatetimeIndex
+        freq (str): Pandas offset alias of the buckets
+
+    Returns:
+        pandas.DataFrame: Columns value (mean), min, max and count; empty buckets are dropped
+    """
+    values = values.copy(deep=False)
+    values.index = _to_utc(values.index)
+    rollup = values.resample(freq).agg(["mean", "min", "max", "count"])
+    rollup.columns = ROLLUP_COLUMNS
+    rollup.index.name = "datetime"
+    return rollup[rollup["count"] > 0]
+
+
+def combine_rollup(rollup, freq):
+    """
+    Re-aggregate a rollup into coarser buckets, weighting means by count.
+
+    Args:
+        rollup (pandas.DataFrame): Finer rollup with ROLLUP_COLUMNS
+        freq (str): Pandas offset alias of the coarser buckets
+
+    Returns:
+        pandas.DataFrame: Coarser rollup with ROLLUP_COLUMNS
+    """
+    if rollup.empty:
+        return _empty_rollup()
+    resampler = pd.DataFrame({
+        "total": rollup["value"].fillna(0) * rollup["count"],
+        "min": rollup["min"],
+        "max": rollup["max"],
+        "count": rollup["count"]
+    }).resample(freq)
+    counts = resampler["count"].sum()
+    combined = pd.DataFrame({
+        "value": resampler["total"].sum() / counts.where(counts > 0),
+        "min": resampler["min"].min(),
+        "max": resampler["max"].max(),
+        "count": counts
+    })
+    combined.index.name = "datetime"
+    return combined
+
+
+def read_rollup(station_id, pollutant, level):
+    """
+    Read a stored rollup level for a series.
+
+    Returns:
+        pandas.DataFrame: Rollup with ROLLUP_COLUMNS (empty if none is stored)
+    """
+    try:
+        return pd.read_parquet(_rollup_path(station_id, pollutant, level))
+    except (OSError, ValueError):
+        return _empty_rollup()
+
+
+def _write_rollup(station_id, pollutant, level, rollup):
+    path = _rollup_path(station_id, pollutant, level)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        rollup.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+    except (OSError, ValueError, TypeError):
+        tmp_path.unlink(missing_ok=True)
+
+
+def update_rollups(station_id, pollutant, df, days):
+    """
+    Refresh every rollup level after measurements for `days` were ingested.
+
+    Hourly and daily buckets of the given days are replaced; every ingested
+    day gets a daily row, with a count of 0 if it had no data, so the daily
+    level also records which days are covered. Weekly and monthly levels are
+    rebuilt from the daily level.
+
+    Args:
+        station_id (str): The ID of the monitoring station
+        pollutant (str): The pollutant code (pm10, pm25, etc.)
+        df (pandas.DataFrame): All measurements for `days`, with a value column
+        days (list): datetime.date objects the measurements cover
+    """
+    if not days:
+        return
+    
+    if df.empty or "value" not in df.columns:
+        hourly_new = _empty_rollup()
+    else:
+        hourly_new = aggregate_values(pd.to_numeric(df["value"], errors="coerce"), ROLLUP_LEVELS["hourly"]["freq"])
+    
+    day_index = pd.DatetimeIndex(pd.to_datetime(sorted(days)), name="datetime").tz_localize("UTC")
+    daily_new = combine_rollup(hourly_new, ROLLUP_LEVELS["daily"]["freq"]).reindex(day_index)
+    daily_new["count"] = daily_new["count"].fillna(0)
+    
+    # Concurrent ingests of the same series must not drop each other's buckets
+    with series_lock(station_id, pollutant):
+        for level, new in (("hourly", hourly_new), ("daily", daily_new)):
+            existing = read_rollup(station_id, pollutant, level)
+            existing = existing[~pd.Index(existing.index.date).isin(days)]
+            frames = [frame for frame in (existing, new) if not frame.empty]
+            merged = pd.concat(frames).sort_index() if frames else _empty_rollup()
+            _write_rollup(station_id, pollutant, level, merged)
+            if level == "daily":
+                daily = merged
+        
+        for level in ("weekly", "monthly"):
+            _write_rollup(station_id, pollutant, level, combine_rollup(daily, ROLLUP_LEVELS[level]["freq"]))
+
+
+def choose_level(days, min_points=ROLLUP_MIN_POINTS):
+    """
+    Pick the coarsest rollup level that still gives `min_points` over `days`.
+
+    Args:
+        days (int): Length of the requested window in days
+        min_points (int): Minimum number of buckets the chart should get
+
+    Returns:
+        str: Key of ROLLUP_LEVELS
+    """
+    for level in ("monthly", "weekly", "daily"):
+        if days / ROLLUP_LEVELS[level]["days"] >= min_points:
+            return level
+    return "hourly"
@@ -0,0 +1,329 @@
+import json
+import math
+import os
+import threading
+from bisect import bisect_right, insort
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from measurement_store import partition_dir, series_lock
+
+# Trailing window of the live moving average, in hours
+ROLLING_WINDOW_HOURS = 24
+
+# Quantiles estimated incrementally for every series
+STREAMING_QUANTILES = (0.5, 0.95)
+
+HOUR_NS = 3600 * 10 ** 9
+
+
+def _stats_path(station_id, pollutant):
+    return partition_dir(station_id, pollutant) / "stats.json"
+
+
+class P2Quantile:
+    """
+    Streaming quantile estimate with constant memory (Jain & Chlamtac's P²
+    algorithm): five markers track the minimum, the quantile, the maximum and
+    two points in between, and are nudged as values arrive.
+    """
+
+    def __init__(self, p):
+        self.p = p
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x):
+        heights, positions = self.heights, self.positions
+        if len(heights) < 5:
+            insort(heights, x)
+            return
+
+        if x < heights[0]:
+            heights[0] = x
+            k = 0
+        elif x >= heights[4]:
+            heights[4] = x
+            k = 3
+        else:
+            k = bisect_right(heights, x) - 1
+
+        for i in range(k + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in (1, 2, 3):
+            offset = self.desired[i] - positions[i]
+            if (offset >= 1 and positions[i + 1] - positions[i] > 1) or \
+                    (offset <= -1 and positions[i - 1] - positions[i] < -1):
+                d = 1 if offset > 0 else -1
+                height = self._parabolic(i, d)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + d * (heights[i + d] - heights[i]) / (positions[i + d] - positions[i])
+                heights[i] = height
+                positions[i] += d
+
+    def _parabolic(self, i, d):
+        h, n = self.heights, self.positions
+        return h[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    @property
+    def value(self):
+        if not self.heights:
+            return math.nan
+        if len(self.heights) < 5:
+            return self.heights[int(round(self.p * (len(self.heights) - 1)))]
+        return self.heights[2]
+
+    def to_dict(self):
+        return {
+            "p": self.p,
+            "heights": self.heights,
+            "positions": self.positions,
+            "desired": self.desired
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        estimator = cls(state["p"])
+        estimator.heights = list(state["heights"])
+        estimator.positions = list(state["positions"])
+        estimator.desired = list(state["desired"])
+        return estimator
+
+
+class CountedTimestamps:
+    """
+    Set of timestamps (epoch nanoseconds) stored as runs of consecutive hours.
+
+    Runs are kept per offset within the hour, where they never overlap, so
+    hourly series of any length take a few runs and both lookups and
+    additions cost O(new timestamps + runs).
+    """
+
+    def __init__(self):
+        # Offset within the hour to (sorted run starts, run ends)
+        self.runs = {}
+
+    def contains(self, stamps):
+        """
+        Args:
+            stamps (numpy.ndarray): int64 timestamps
+
+        Returns:
+            numpy.ndarray: Boolean mask of the timestamps already in the set
+        """
+        found = np.zeros(len(stamps), dtype=bool)
+        phases = stamps % HOUR_NS
+        for phase, (starts, ends) in self.runs.items():
+            in_phase = np.flatnonzero(phases == phase)
+            candidates = stamps[in_phase]
+            run = np.searchsorted(starts, candidates, side="right") - 1
+            inside = run >= 0
+            inside[inside] = candidates[inside] <= ends[run[inside]]
+            found[in_phase[inside]] = True
+        return found
+
+    def add(self, stamps):
+        """Add sorted, unique timestamps that are not in the set yet."""
+        phases = stamps % HOUR_NS
+        for phase in np.unique(phases).tolist():
+            new = stamps[phases == phase]
+            breaks = np.flatnonzero(np.diff(new) != HOUR_NS) + 1
+            starts = new[np.r_[0, breaks]]
+            ends = new[np.r_[breaks - 1, len(new) - 1]]
+            if phase in self.runs:
+                old_starts, old_ends = self.runs[phase]
+                starts = np.concatenate([old_starts, starts])
+                ends = np.concatenate([old_ends, ends])
+                order = np.argsort(starts, kind="stable")
+                starts, ends = starts[order], ends[order]
+            # Merge runs that follow each other without a missing hour
+            first = np.r_[True, starts[1:] != ends[:-1] + HOUR_NS]
+            self.runs[phase] = (starts[first], np.maximum.reduceat(ends, np.flatnonzero(first)))
+
+    def to_dict(self):
+        return {
+            str(phase): np.column_stack(runs).tolist()
+            for phase, runs in self.runs.items()
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        counted = cls()
+        for phase, runs in state.items():
+            runs = np.asarray(runs, dtype=np.int64).reshape(-1, 2)
+            counted.runs[int(phase)] = (runs[:, 0], runs[:, 1])
+        return counted
+
+
+class RunningStats:
+    """
+    Incremental statistics of one station/pollutant series.
+
+    Keeps count/sum/min/max, streaming quantiles and the values of the
+    trailing window, so appending measurements costs O(new points) however
+    long the history is. Every timestamp is counted once: readings that fill
+    a gap in the history (e.g. a chunk that failed earlier) are added, while
+    revised values of readings already counted are not reflected.
+    """
+
+    def __init__(self, window_hours=ROLLING_WINDOW_HOURS, quantiles=STREAMING_QUANTILES):
+        self.window_hours = window_hours
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.quantiles = {q: P2Quantile(q) for q in quantiles}
+        self.counted = CountedTimestamps()
+        self._window = deque()
+
+    def update(self, values):
+        """
+        Add the measurements whose timestamps were not counted yet.
+
+        Args:
+            values (pandas.Series): Measurements with a DatetimeIndex
+
+        Returns:
+            int: Number of measurements added
+        """
+        values = pd.to_numeric(values, errors="coerce").dropna()
+        if values.empty:
+            return 0
+        timestamps = values.index.tz_localize("UTC") if values.index.tz is None else values.index.tz_convert("UTC")
+        stamps, first = np.unique(timestamps.as_unit("ns").asi8, return_index=True)
+        new_values = values.to_numpy(dtype=float)[first]
+        is_new = ~self.counted.contains(stamps)
+        if not is_new.any():
+            return 0
+
+        stamps, new_values = stamps[is_new], new_values[is_new]
+        self.counted.add(stamps)
+        self.count += len(new_values)
+        self.total += float(new_values.sum())
+        self.min = min(self.min, float(new_values.min()))
+        self.max = max(self.max, float(new_values.max()))
+        for estimator in self.quantiles.values():
+            for x in new_values.tolist():
+                estimator.add(x)
+
+        self.first_timestamp = int(stamps[0]) if self.first_timestamp is None else min(self.first_timestamp, int(stamps[0]))
+        self.last_timestamp = int(stamps[-1]) if self.last_timestamp is None else max(self.last_timestamp, int(stamps[-1]))
+
+        # The window holds at most a day of points, so it is simply re-sorted
+        cutoff = self.last_timestamp - pd.Timedelta(hours=self.window_hours).value
+        is_recent = stamps > cutoff
+        window = sorted(list(self._window) + list(zip(stamps[is_recent].tolist(), new_values[is_recent].tolist())))
+        self._window = deque(point for point in window if point[0] > cutoff)
+        return len(new_values)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else math.nan
+
+    @property
+    def rolling_mean(self):
+        """Mean of the trailing `window_hours` ending at the latest measurement."""
+        if not self._window:
+            return math.nan
+        return sum(value for _, value in self._window) / len(self._window)
+
+    @property
+    def last_update(self):
+        return pd.Timestamp(self.last_timestamp, tz="UTC") if self.last_timestamp is not None else None
+
+    def quantile(self, q):
+        return self.quantiles[q].value
+
+    def to_dict(self):
+        return {
+            "window_hours": self.window_hours,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "first_timestamp": self.first_timestamp,
+            "last_timestamp": self.last_timestamp,
+            "quantiles": [estimator.to_dict() for estimator in self.quantiles.values()],
+            "counted": self.counted.to_dict(),
+            "window": list(self._window)
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        stats = cls(window_hours=state["window_hours"], quantiles=())
+        stats.count = state["count"]
+        stats.total = state["total"]
+        stats.min = state["min"] if state["min"] is not None else math.inf
+        stats.max = state["max"] if state["max"] is not None else -math.inf
+        stats.first_timestamp = state["first_timestamp"]
+        stats.last_timestamp = state["last_timestamp"]
+        stats.quantiles = {q["p"]: P2Quantile.from_dict(q) for q in state["quantiles"]}
+        if "counted" in state:
+            stats.counted = CountedTimestamps.from_dict(state["counted"])
+        elif stats.first_timestamp is not None:
+            # Written before coverage was tracked, when only the span was known
+            stats.counted.runs[stats.first_timestamp % HOUR_NS] = (
+                np.array([stats.first_timestamp]), np.array([stats.last_timestamp])
+            )
+        stats._window = deque(tuple(point) for point in state["window"])
+        return stats
+
+
+def load_running_stats(station_id, pollutant):
+    """
+    Read the persisted statistics of a series.
+
+    Returns:
+        RunningStats: Stored state, or empty statistics if none is stored
+    """
+    try:
+        with open(_stats_path(station_id, pollutant)) as f:
+            return RunningStats.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError):
+        return RunningStats()
+
+
+def save_running_stats(station_id, pollutant, stats):
+    path = _stats_path(station_id, pollutant)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(stats.to_dict(), f)
+        os.replace(tmp_path, path)
+    except (OSError, ValueError, TypeError):
+        tmp_path.unlink(missing_ok=True)
+
+
+def update_running_stats(station_id, pollutant, df):
+    """
+    Fold newly ingested measurements into the persisted statistics of a series.
+
+    The load, update and save run under the series lock, so concurrent
+    ingests of the same series do not lose each other's measurements.
+
+    Args:
+        station_id (str): The ID of the monitoring station
+        pollutant (str): The pollutant code (pm10, pm25, etc.)
+        df (pandas.DataFrame): Measurements with a value column
+
+    Returns:
+        RunningStats: The updated statistics
+    """
+    with series_lock(station_id, pollutant):
+        stats = load_running_stats(station_id, pollutant)
+        if not df.empty and "value" in df.columns and stats.update(df["value"]):
+            save_running_stats(station_id, pollutant, stats)
+    return stats
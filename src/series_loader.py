@@ -0,0 +1,430 @@
+"""
+Loading of measurement series without any Streamlit output.
+
+Downloads measurements through the hedged measurement client, keeps the
+local measurement store, rollups and running statistics up to date, and
+summarizes series for the dashboard and the headless reports alike. Safe to
+call from worker threads and worker processes.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from measurement_store import read_days, write_days, missing_days, contiguous_ranges
+from rollups import ROLLUP_LEVELS, update_rollups, read_rollup, choose_level
+from running_stats import update_running_stats
+from api_client import get_measurement_client
+from instrumentation import in_context
+from shared_cache import get_shared_cache
+from aqi import compute_aqi, count_exceedances
+from settings import (
+    API_BASE_URL, MEASUREMENT_PAGE_LIMIT, MEASUREMENT_CHUNK_DAYS, MEASUREMENT_FETCH_WORKERS,
+    ROLLUP_MIN_POINTS, SERIES_CACHE_TTL
+)
+
+logger = logging.getLogger(__name__)
+
+
+def parse_measurements(data):
+    """
+    Convert a measurements API response into a DataFrame.
+    
+    Args:
+        data (dict or list): Decoded JSON response
+        
+    Returns:
+        pandas.DataFrame: Measurements with a datetime index (empty if the API returned no rows)
+        
+    Raises:
+        ValueError: If the response structure is not recognized
+    """
+    if isinstance(data, dict) and "results" in data:
+        if len(data["results"]) == 0:
+            return pd.DataFrame()
+        df = pd.DataFrame(data["results"])
+        df["datetime"] = pd.to_datetime(df["datetime"])
+        return df.set_index("datetime")
+    elif isinstance(data, list):
+        if len(data) == 0:
+            return pd.DataFrame()
+        # Handle case where API returns a list directly
+        df = pd.DataFrame(data)
+        if "date" in df.columns:
+            df["datetime"] = pd.to_datetime(df["date"])
+        elif "timestamp" in df.columns:
+            df["datetime"] = pd.to_datetime(df["timestamp"])
+        else:
+            raise ValueError("Could not find date column in response")
+        return df.set_index("datetime")
+    
+    raise ValueError(f"API returned unexpected data structure: {data}")
+
+
+def request_measurements(station_id, pollutant, start_str, end_str, client=None,
+                         limit=MEASUREMENT_PAGE_LIMIT):
+    """
+    Fetch measurements for a date range from the API.
+    
+    The primary /measurements endpoint and the per-station alternative are
+    hedged: the alternative is started if the primary fails or is slow, and
+    an endpoint that keeps failing is skipped until it recovers. Safe to call
+    from worker threads: progress is logged rather than written to the page.
+    
+    Args:
+        station_id (str): The ID of the monitoring station
+        pollutant (str): The pollutant code (pm10, pm25, etc.)
+        start_str (str): First day to fetch (YYYY-MM-DD)
+        end_str (str): Last day to fetch (YYYY-MM-DD)
+        client (api_client.HedgedClient): Client to send the requests with
+        limit (int): Maximum number of rows the API should return
+        
+    Returns:
+        pandas.DataFrame: Measurements with a datetime index
+    """
+    params = {
+        "pollutant": pollutant,
+        "start_date": start_str,
+        "end_date": end_str,
+        "format": "json",
+        "limit": limit
+    }
+    endpoints = [
+        ("measurements", f"{API_BASE_URL}/measurements", {"station_id": station_id, **params}),
+        ("station_measurements", f"{API_BASE_URL}/stations/{station_id}/measurements", params)
+    ]
+    
+    def parse(response):
+        logger.info("Response status code: %s from %s", response.status_code, response.url)
+        return parse_measurements(response.json())
+    
+    logger.info("Fetching %s for station %s from %s to %s", pollutant, station_id, start_str, end_str)
+    return (client or get_measurement_client()).get(endpoints, parse)
+
+
+def fetch_measurement_chunk(station_id, pollutant, first_day, last_day, client=None,
+                            limit=MEASUREMENT_PAGE_LIMIT):
+    """
+    Fetch a date range, splitting it in half whenever the API hits the row limit.
+    
+    Args:
+        station_id (str): The ID of the monitoring station
+        pollutant (str): The pollutant code (pm10, pm25, etc.)
+        first_day (datetime.date): First day of the range
+        last_day (datetime.date): Last day of the range
+        client (api_client.HedgedClient): Client to send the requests with
+        limit (int): Maximum number of rows per request
+        
+    Returns:
+        pandas.DataFrame: All measurements in the range
+    """
+    df = request_measurements(
+        station_id,
+        pollutant,
+        first_day.strftime("%Y-%m-%d"),
+        last_day.strftime("%Y-%m-%d"),
+        client=client,
+        limit=limit
+    )
+    if len(df) < limit:
+        return df
+    
+    if first_day == last_day:
+        logger.warning("%s %s on %s exceeds %d rows; result is truncated", station_id, pollutant, first_day, limit)
+        return df
+    
+    middle = first_day + (last_day - first_day) // 2
+    halves = [
+        fetch_measurement_chunk(station_id, pollutant, first_day, middle, client, limit),
+        fetch_measurement_chunk(station_id, pollutant, middle + timedelta(days=1), last_day, client, limit)
+    ]
+    halves = [half for half in halves if not half.empty]
+    return pd.concat(halves) if halves else pd.DataFrame()
+
+
+def split_into_chunks(days, chunk_days=MEASUREMENT_CHUNK_DAYS):
+    """
+    Split sorted dates into contiguous (first_day, last_day) chunks of at most `chunk_days` days.
+    """
+    chunks = []
+    for first_day, last_day in contiguous_ranges(days):
+        while first_day <= last_day:
+            chunk_end = min(first_day + timedelta(days=chunk_days - 1), last_day)
+            chunks.append((first_day, chunk_end))
+            first_day = chunk_end + timedelta(days=1)
+    return chunks
+
+
+def download_measurements(station_id, pollutant, days, max_workers=MEASUREMENT_FETCH_WORKERS):
+    """
+    Download the given days concurrently, one request chunk per worker.
+    
+    Args:
+        station_id (str): The ID of the monitoring station
+        pollutant (str): The pollutant code (pm10, pm25, etc.)
+        days (list): Sorted datetime.date objects to download
+        max_workers (int): Maximum number of chunks in flight
+        
+    Returns:
+        tuple: (list of (chunk days, DataFrame) for successful chunks, list of exceptions for failed chunks)
+    """
+    chunks = split_into_chunks(days)
+    results = []
+    errors = []
+    if not chunks:
+        return results, errors
+    
+    client = get_measurement_client()
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+        futures = [
+            ((first_day, last_day), executor.submit(
+                in_context(fetch_measurement_chunk), station_id, pollutant, first_day, last_day, client
+            ))
+            for first_day, last_day in chunks
+        ]
+        for (first_day, last_day), future in futures:
+            try:
+                df = future.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+            results.append(([d for d in days if first_day <= d <= last_day], df))
+    
+    return results, errors
+
+
+def requested_days(days):
+    """Calendar days covered by a window of `days` days ending now."""
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=days)
+    return [
+        start_date.date() + timedelta(days=offset)
+        for offset in range((end_date.date() - start_date.date()).days + 1)
+    ]
+
+
+def ingest_measurements(station_id, pollutant, days):
+    """
+    Download days from the API into the measurement store and refresh the
+    rollups and running statistics.
+    
+    Args:
+        station_id (str): The ID of the monitoring station
+        pollutant (str): The pollutant code (pm10, pm25, etc.)
+        days (list): Sorted datetime.date objects to download
+        
+    Returns:
+        tuple: (list of fetched non-empty DataFrames, list of exceptions for chunks that failed)
+    """
+    results, errors = download_measurements(station_id, pollutant, days)
+    frames = []
+    for chunk_days, fetched_df in results:
+        write_days(station_id, pollutant, fetched_df, chunk_days)
+        update_rollups(station_id, pollutant, fetched_df, chunk_days)
+        if not fetched_df.empty:
+            frames.append(fetched_df)
+    if frames:
+        update_running_stats(station_id, pollutant, pd.concat(frames))
+    return frames, errors
+
+
+def load_historical_data(station_id, pollutant, days=30):
+    """
+    Load historical pollutant data without any Streamlit output.
+    
+    Finalized days are served from the local measurement store; only days
+    that are missing or still subject to revision are requested from the API
+    and written back to the store. Safe to call from worker threads.
+    
+    Complete results are kept in the process-wide shared cache for
+    SERIES_CACHE_TTL seconds, so sessions asking for the same window share
+    one load; the returned frame must not be modified.
+    
+    Args:
+        station_id (str): The ID of the monitoring station
+        pollutant (str): The pollutant code (pm10, pm25, etc.)
+        days (int): Number of days of historical data to fetch
+        
+    Returns:
+        tuple: (pandas.DataFrame with datetime index, list of exceptions for date ranges that failed)
+    """
+    window_days = requested_days(days)
+    return get_shared_cache().get_or_load(
+        "measurements", (str(station_id), str(pollutant), window_days[0], window_days[-1]),
+        lambda: _read_historical_data(station_id, pollutant, window_days),
+        ttl=SERIES_CACHE_TTL, keep=lambda result: not result[1]
+    )
+
+
+def _read_historical_data(station_id, pollutant, window_days):
+    cached_df, missing = read_days(station_id, pollutant, window_days)
+    frames = [cached_df] if not cached_df.empty else []
+    
+    fetched, errors = ingest_measurements(station_id, pollutant, missing)
+    frames.extend(fetched)
+    
+    if not frames:
+        return pd.DataFrame(), errors
+    
+    df = pd.concat(frames)
+    df = df[pd.Index(df.index.date).isin(window_days)]
+    df = df[~df.index.duplicated(keep="last")].sort_index()
+    df.index.name = "datetime"
+    return df, errors
+
+
+def load_series(station_id, pollutant, days=30, level=None, min_points=ROLLUP_MIN_POINTS):
+    """
+    Load a series at a rollup level without any Streamlit output.
+    
+    Missing days are ingested first, but the window itself is read from the
+    precomputed rollup rather than from raw measurements, so a year of data
+    at daily level costs about as much as a week at hourly level. Complete
+    results are shared like those of `load_historical_data`.
+    
+    Args:
+        station_id (str): The ID of the monitoring station
+        pollutant (str): The pollutant code (pm10, pm25, etc.)
+        days (int): Number of days of historical data to load
+        level (str): Key of ROLLUP_LEVELS; picked from `days` and `min_points` if None
+        min_points (int): Minimum buckets wanted when picking the level
+        
+    Returns:
+        tuple: (pandas.DataFrame with value/min/max/count columns, level used,
+        list of exceptions for date ranges that failed)
+    """
+    level = level or choose_level(days, min_points)
+    window_days = requested_days(days)
+    rollup, errors = get_shared_cache().get_or_load(
+        "series", (str(station_id), str(pollutant), level, window_days[0], window_days[-1]),
+        lambda: _read_series(station_id, pollutant, level, window_days),
+        ttl=SERIES_CACHE_TTL, keep=lambda result: not result[1]
+    )
+    return rollup, level, errors
+
+
+def _read_series(station_id, pollutant, level, window_days):
+    missing = missing_days(station_id, pollutant, window_days)
+    _, errors = ingest_measurements(station_id, pollutant, missing)
+    
+    # Days stored before rollups existed are rolled up once from the raw store
+    covered = set(read_rollup(station_id, pollutant, "daily").index.date)
+    uncovered = [d for d in window_days if d not in covered and d not in missing]
+    if uncovered:
+        cached_df, _ = read_days(station_id, pollutant, uncovered)
+        update_rollups(station_id, pollutant, cached_df, uncovered)
+    
+    rollup = read_rollup(station_id, pollutant, level)
+    periods = rollup.index.tz_localize(None).to_period(ROLLUP_LEVELS[level]["period"])
+    start = pd.Timestamp(window_days[0])
+    end = pd.Timestamp(window_days[-1] + timedelta(days=1))
+    in_window = (periods.start_time < end) & (periods.end_time >= start)
+    return rollup[in_window & (rollup["count"] > 0)], errors
+
+
+def summarize_rollup(df):
+    """
+    Exact mean, maximum and minimum of a series from its rollup buckets.
+    
+    Args:
+        df (pandas.DataFrame): Rollup with value/min/max/count columns, or raw data with only value
+        
+    Returns:
+        dict: mean, max and min
+    """
+    if {"min", "max", "count"}.issubset(df.columns):
+        total = df["count"].sum()
+        return {
+            "mean": (df["value"] * df["count"]).sum() / total if total else float("nan"),
+            "max": df["max"].max(),
+            "min": df["min"].min()
+        }
+    return {"mean": df["value"].mean(), "max": df["value"].max(), "min": df["value"].min()}
+
+
+def fetch_many_historical(series, days=30, level="hourly", max_workers=MEASUREMENT_FETCH_WORKERS):
+    """
+    Load several station/pollutant series concurrently.
+    
+    Args:
+        series (list): (station_id, pollutant) tuples
+        days (int): Number of days of historical data to fetch
+        level (str): Rollup level to load, key of ROLLUP_LEVELS
+        max_workers (int): Maximum number of series loaded at the same time
+        
+    Returns:
+        tuple: (dict mapping (station_id, pollutant) to DataFrame, dict mapping
+        (station_id, pollutant) to the first error for series that had failures)
+    """
+    frames = {}
+    errors = {}
+    if not series:
+        return frames, errors
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(series))) as executor:
+        futures = [(key, executor.submit(in_context(load_series), key[0], key[1], days, level)) for key in series]
+        for key, future in futures:
+            try:
+                df, _, series_errors = future.result()
+            except Exception as e:
+                df, series_errors = pd.DataFrame(), [e]
+            frames[key] = df
+            if series_errors:
+                errors[key] = series_errors[0]
+    
+    return frames, errors
+
+
+def stack_series(frames):
+    """
+    Combine per-series frames into the long layout used by the AQI engine.
+    
+    Args:
+        frames (dict): (station_id, pollutant) to DataFrame with a value column
+        
+    Returns:
+        pandas.DataFrame: station_id, pollutant and value columns on a DatetimeIndex
+    """
+    parts = [
+        df[["value"]].assign(station_id=station_id, pollutant=pollutant)
+        for (station_id, pollutant), df in frames.items()
+        if not df.empty and "value" in df.columns
+    ]
+    if not parts:
+        return pd.DataFrame(columns=["station_id", "pollutant", "value"])
+    return pd.concat(parts)
+
+
+def summarize_aqi(frames, labels):
+    """
+    Summarize AQI and WHO/EPA exceedances for hourly series of many stations.
+    
+    Args:
+        frames (dict): (station_id, pollutant) to hourly DataFrame with a value column
+        labels (dict): (station_id, pollutant) to station display name
+        
+    Returns:
+        tuple: (DataFrame with latest/peak AQI per station, DataFrame of
+        exceedance counts per station, pollutant and standard)
+    """
+    measurements = stack_series(frames)
+    if measurements.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    
+    names = {station_id: label for (station_id, _), label in labels.items()}
+    hourly = compute_aqi(measurements).dropna(subset=["aqi"])
+    latest = hourly.groupby(level="station_id").tail(1).reset_index(level="datetime")
+    peak = hourly.groupby(level="station_id")["aqi"].max()
+    aqi_summary = pd.DataFrame({
+        "station": latest.index.map(names),
+        "latest AQI": latest["aqi"],
+        "category": latest["category"],
+        "dominant pollutant": latest["dominant_pollutant"],
+        "peak AQI": peak.reindex(latest.index),
+        "as of": latest["datetime"]
+    }).set_index("station")
+    
+    exceedances = count_exceedances(measurements)
+    exceedances.insert(0, "station", exceedances.pop("station_id").map(names))
+    return aqi_summary, exceedances
@@ -0,0 +1,82 @@
+import os
+from pathlib import Path
+
+# Root directory for on-disk caches (station catalog shards, measurements, ...)
+CACHE_DIR = Path(os.environ.get(
+    "AQ_CACHE_DIR",
+    Path(__file__).resolve().parent.parent / ".cache"
+))
+
+# Seconds before a cached per-country station shard is considered expired
+STATION_CATALOG_TTL = int(os.environ.get("AQ_STATION_CATALOG_TTL", 24 * 3600))
+
+# Base URL of the Energy and Clean Air API
+API_BASE_URL = os.environ.get("AQ_API_BASE_URL", "https://api.energyandcleanair.org").rstrip("/")
+
+# Concurrent station fetching: countries per request and parallel requests
+STATION_FETCH_BATCH_SIZE = int(os.environ.get("AQ_STATION_FETCH_BATCH_SIZE", 1))
+STATION_FETCH_WORKERS = int(os.environ.get("AQ_STATION_FETCH_WORKERS", 8))
+
+# Per-request retry policy for the pooled HTTP session
+HTTP_RETRIES = int(os.environ.get("AQ_HTTP_RETRIES", 3))
+HTTP_BACKOFF_FACTOR = float(os.environ.get("AQ_HTTP_BACKOFF_FACTOR", 0.5))
+
+# Hours after the end of a day before its measurements are considered final
+# and no longer refetched from the API
+MEASUREMENT_FINALIZE_HOURS = int(os.environ.get("AQ_MEASUREMENT_FINALIZE_HOURS", 48))
+
+# Historical downloads: rows per API request, days per request chunk and
+# parallel chunk requests
+MEASUREMENT_PAGE_LIMIT = int(os.environ.get("AQ_MEASUREMENT_PAGE_LIMIT", 1000))
+MEASUREMENT_CHUNK_DAYS = int(os.environ.get("AQ_MEASUREMENT_CHUNK_DAYS", 30))
+MEASUREMENT_FETCH_WORKERS = int(os.environ.get("AQ_MEASUREMENT_FETCH_WORKERS", 8))
+
+# Station count above which the map switches to client-side rendering
+MAP_FAST_RENDER_THRESHOLD = int(os.environ.get("AQ_MAP_FAST_RENDER_THRESHOLD", 2000))
+
+# Density overview: (min zoom, max zoom, cell size in degrees) per grid level.
+# Individual markers are only shown above the last level's max zoom.
+DENSITY_GRID_LEVELS = ((0, 3, 5.0), (4, 5, 1.0), (6, 7, 0.25))
+
+# Rows serialized at a time by the export writers
+EXPORT_CHUNK_ROWS = int(os.environ.get("AQ_EXPORT_CHUNK_ROWS", 100_000))
+
+# Maximum points per plotted series; longer series are downsampled before plotting
+PLOT_MAX_POINTS = int(os.environ.get("AQ_PLOT_MAX_POINTS", 2000))
+
+# Minimum points a rollup level must provide over the requested window to be
+# used instead of a finer level; with 100, windows from 100, 700 and 3040
+# days are served from the daily, weekly and monthly levels
+ROLLUP_MIN_POINTS = int(os.environ.get("AQ_ROLLUP_MIN_POINTS", 100))
+
+# Worker processes used by the headless report engine
+REPORT_WORKERS = int(os.environ.get("AQ_REPORT_WORKERS", os.cpu_count() or 1))
+
+# Series loaded per report scope for the time series summaries, and their window in days
+REPORT_MAX_SERIES = int(os.environ.get("AQ_REPORT_MAX_SERIES", 25))
+REPORT_SERIES_DAYS = int(os.environ.get("AQ_REPORT_SERIES_DAYS", 30))
+
+# Measurement client: overall deadline of a request in seconds, delay before
+# the alternative endpoint is raced against a slow primary, consecutive
+# failures before an endpoint's circuit opens and its initial/maximum
+# cool-down (doubled on every failed probe)
+MEASUREMENT_TIMEOUT = float(os.environ.get("AQ_MEASUREMENT_TIMEOUT", 15))
+MEASUREMENT_HEDGE_DELAY = float(os.environ.get("AQ_MEASUREMENT_HEDGE_DELAY", 1.0))
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("AQ_CIRCUIT_FAILURE_THRESHOLD", 3))
+CIRCUIT_RESET_SECONDS = float(os.environ.get("AQ_CIRCUIT_RESET_SECONDS", 30))
+CIRCUIT_MAX_RESET_SECONDS = float(os.environ.get("AQ_CIRCUIT_MAX_RESET_SECONDS", 600))
+
+# Radius in km of the "stations near a clicked location" queries
+NEARBY_RADIUS_KM = float(os.environ.get("AQ_NEARBY_RADIUS_KM", 25))
+
+# Process-wide cache of station catalogs and measurement series shared by all
+# sessions: memory budget in MB (least recently used entries are evicted
+# beyond it) and seconds before a catalog or series entry is reloaded
+SHARED_CACHE_MB = int(os.environ.get("AQ_SHARED_CACHE_MB", 1024))
+CATALOG_CACHE_TTL = int(os.environ.get("AQ_CATALOG_CACHE_TTL", 3600))
+SERIES_CACHE_TTL = int(os.environ.get("AQ_SERIES_CACHE_TTL", 600))
+
+# Print the instrumentation's structured JSON events (spans, HTTP calls,
+# cache lookups) to stderr, and show the per-rerun debug panel in the sidebar
+INSTRUMENTATION_LOG = os.environ.get("AQ_INSTRUMENTATION_LOG", "0") == "1"
+DEBUG_PANEL = os.environ.get("AQ_DEBUG_PANEL", "0") == "1"
@@ -0,0 +1,221 @@
+"""
+Process-wide in-memory cache shared by every dashboard session and report.
+
+Entries are grouped in namespaces (e.g. station catalogs, measurement
+series) that share one memory budget: once the estimated size of all
+entries exceeds it, the least recently used entries are evicted, whatever
+their namespace. Concurrent lookups of a key that is being loaded wait for
+that load instead of starting their own. Hits and misses are reported to
+`instrumentation.record_cache` under the namespace name.
+
+Cached values are handed to every caller as is and must be treated as
+read-only.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from instrumentation import record_cache
+from settings import SHARED_CACHE_MB
+
+# Geometries live outside the frame's buffers (Python object plus GEOS
+# geometry); rough size of one point
+GEOMETRY_BYTES = 160
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def estimate_bytes(value):
+    """
+    Approximate memory held by a cached value.
+
+    Frames and series are measured with `memory_usage(deep=True)`; tuples,
+    lists and dicts are the sum of their items.
+    """
+    if isinstance(value, pd.DataFrame):
+        size = int(value.memory_usage(index=True, deep=True).sum())
+        geometry_columns = [c for c in value.columns if value[c].dtype.name == "geometry"]
+        return size + GEOMETRY_BYTES * len(value) * len(geometry_columns)
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_bytes(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_bytes(k) + estimate_bytes(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires")
+
+    def __init__(self, value, size, expires):
+        self.value = value
+        self.size = size
+        self.expires = expires
+
+
+class _Load:
+    """A load in flight, awaited by coalesced lookups of the same key."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SharedCache:
+    """
+    Thread-safe LRU cache bounded by the estimated size of its entries.
+
+    Args:
+        max_bytes (int): Memory budget of all namespaces together
+        sizeof (callable): Estimates the bytes held by a value
+    """
+
+    def __init__(self, max_bytes, sizeof=estimate_bytes):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._loads = {}
+        self._bytes = 0
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _count(self, namespace, field, amount=1):
+        counts = self._stats.setdefault(
+            namespace, {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "oversized": 0}
+        )
+        counts[field] += amount
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def get_or_load(self, namespace, key, load, ttl=None, keep=None):
+        """
+        Return the cached value of `key`, loading it once if it is missing.
+
+        Args:
+            namespace (str): Kind of value, used for statistics and `clear`
+            key (hashable): Identifies the value within the namespace
+            load (callable): Computes the value; runs at most once per key at a time
+            ttl (float): Seconds the value stays valid, None for no expiry
+            keep (callable): Takes the loaded value and returns False when it
+                should not be cached (e.g. a partial result); waiting callers
+                still receive it
+
+        Returns:
+            The cached or loaded value; exceptions of `load` propagate to
+            every caller waiting on it and nothing is cached
+        """
+        full_key = (namespace, key)
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None and entry.expires is not None and entry.expires <= time.monotonic():
+                self._remove(full_key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(full_key)
+                self._count(namespace, "hits")
+            else:
+                pending = self._loads.get(full_key)
+                leader = pending is None
+                if leader:
+                    pending = self._loads[full_key] = _Load()
+                    self._count(namespace, "misses")
+                else:
+                    self._count(namespace, "coalesced")
+
+        if entry is not None:
+            record_cache(namespace, hits=1)
+            return entry.value
+        if not leader:
+            # Another caller is loading this key: its fetch is shared, not repeated
+            record_cache(namespace, hits=1)
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        record_cache(namespace, misses=1)
+        size = None
+        try:
+            value = load()
+            if keep is None or keep(value):
+                size = self.sizeof(value)
+            pending.value = value
+        except BaseException as e:
+            pending.error = e
+            raise
+        finally:
+            # Always release the key, or later lookups would wait on it forever
+            try:
+                with self._lock:
+                    del self._loads[full_key]
+                    if pending.error is None and size is not None:
+                        self._store(namespace, full_key, value, size, ttl)
+            finally:
+                pending.done.set()
+        return value
+
+    def _store(self, namespace, full_key, value, size, ttl):
+        if full_key in self._entries:
+            self._remove(full_key)
+        if size > self.max_bytes:
+            self._count(namespace, "oversized")
+            return
+        while self._bytes + size > self.max_bytes:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self._count(evicted_key[0], "evictions")
+        expires = None if ttl is None else time.monotonic() + ttl
+        self._entries[full_key] = _Entry(value, size, expires)
+        self._bytes += size
+
+    def discard(self, namespace, key):
+        """Drop one entry, e.g. after its source data changed."""
+        with self._lock:
+            if (namespace, key) in self._entries:
+                self._remove((namespace, key))
+
+    def clear(self, namespace=None):
+        """Drop every entry of `namespace`, or of all namespaces if None."""
+        with self._lock:
+            for full_key in [k for k in self._entries if namespace is None or k[0] == namespace]:
+                self._remove(full_key)
+
+    def stats(self):
+        """
+        Lookup counters and current memory use.
+
+        Returns:
+            dict: "bytes" and "max_bytes" of the whole cache, and "namespaces":
+            namespace to hits, misses, coalesced (lookups that waited for
+            another caller's load), evictions, oversized (loads too large to
+            cache), entries and bytes
+        """
+        with self._lock:
+            namespaces = {name: dict(counts, entries=0, bytes=0) for name, counts in self._stats.items()}
+            for (namespace, _), entry in self._entries.items():
+                namespaces[namespace]["entries"] += 1
+                namespaces[namespace]["bytes"] += entry.size
+            return {"bytes": self._bytes, "max_bytes": self.max_bytes, "namespaces": namespaces}
+
+
+def get_shared_cache():
+    """
+    Return the process-wide cache, creating it on first use.
+
+    Returns:
+        SharedCache: Cache bounded by SHARED_CACHE_MB, safe to use from worker threads
+    """
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = SharedCache(SHARED_CACHE_MB * 2 ** 20)
+    return _shared_cache
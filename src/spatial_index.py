@@ -0,0 +1,128 @@
+import numpy as np
+import shapely
+from shapely import STRtree
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Kilometers per degree of latitude
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance in km from one point to arrays of points."""
+    lat, lon, lats, lons = map(np.radians, (lat, lon, lats, lons))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class StationIndex:
+    """
+    STRtree over station coordinates, built once per loaded catalog.
+
+    Queries return positions into the indexed GeoDataFrame (for `.iloc`), so
+    results can be combined with other per-station masks.
+    """
+
+    def __init__(self, stations_gdf):
+        geometry = stations_gdf.geometry
+        valid = (~geometry.isna() & ~geometry.is_empty).to_numpy() if len(stations_gdf) else np.zeros(0, dtype=bool)
+        self.positions = np.flatnonzero(valid)
+        self.lons = geometry.x.to_numpy()[valid] if len(self.positions) else np.zeros(0)
+        self.lats = geometry.y.to_numpy()[valid] if len(self.positions) else np.zeros(0)
+        self.tree = STRtree(shapely.points(self.lons, self.lats))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _query_box(self, min_lon, min_lat, max_lon, max_lat):
+        if min_lon > max_lon:
+            # Box crossing the antimeridian
+            return np.concatenate([
+                self._query_box(min_lon, min_lat, 180, max_lat),
+                self._query_box(-180, min_lat, max_lon, max_lat)
+            ])
+        return self.tree.query(shapely.box(min_lon, min_lat, max_lon, max_lat))
+
+    def bbox(self, min_lon, min_lat, max_lon, max_lat):
+        """
+        Stations inside a bounding box.
+
+        Longitudes may be unwrapped map coordinates (e.g. beyond 180 after
+        panning around the globe); a box with min_lon > max_lon crosses the
+        antimeridian.
+
+        Returns:
+            numpy.ndarray: Sorted positions of the matching stations
+        """
+        if max_lon - min_lon >= 360:
+            min_lon, max_lon = -180, 180
+        else:
+            min_lon = (min_lon + 180) % 360 - 180
+            max_lon = (max_lon + 180) % 360 - 180
+        found = self._query_box(min_lon, min_lat, max_lon, max_lat)
+        return np.sort(self.positions[np.unique(found)])
+
+    def within_radius(self, lat, lon, radius_km):
+        """
+        Stations within `radius_km` of a point, nearest first.
+
+        Returns:
+            tuple: (numpy.ndarray of positions, numpy.ndarray of distances in km)
+        """
+        dlat = radius_km / KM_PER_DEGREE
+        # Widest longitude offset of the circle, reached poleward of its centre
+        # (not at the centre's latitude): asin(sin(r / R) / cos(lat))
+        sin_dlon = np.sin(radius_km / EARTH_RADIUS_KM) / max(np.cos(np.radians(lat)), 1e-12)
+        if abs(lat) + dlat >= 90 or sin_dlon >= 1:
+            # The circle reaches a pole or spans all longitudes
+            candidates = self._query_box(-180, max(lat - dlat, -90), 180, min(lat + dlat, 90))
+        else:
+            dlon = np.degrees(np.arcsin(sin_dlon))
+            min_lon = (lon - dlon + 180) % 360 - 180
+            max_lon = (lon + dlon + 180) % 360 - 180
+            candidates = self._query_box(min_lon, lat - dlat, max_lon, lat + dlat)
+
+        candidates = np.unique(candidates)
+        distances = haversine_km(lat, lon, self.lats[candidates], self.lons[candidates])
+        inside = distances <= radius_km
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.argsort(distances, kind="stable")
+        return self.positions[candidates[order]], distances[order]
+
+    def nearest(self, lat, lon, k=5, start_radius_km=50):
+        """
+        The `k` stations nearest to a point.
+
+        Searches growing radii, so only stations around the point are
+        measured unless the network is sparse there.
+
+        Returns:
+            tuple: (numpy.ndarray of positions, numpy.ndarray of distances in km)
+        """
+        radius = start_radius_km
+        while True:
+            positions, distances = self.within_radius(lat, lon, radius)
+            if len(positions) >= k or radius >= np.pi * EARTH_RADIUS_KM:
+                return positions[:k], distances[:k]
+            radius *= 4
+
+
+def viewport_bounds(bounds):
+    """
+    Convert Leaflet map bounds to (min_lon, min_lat, max_lon, max_lat).
+
+    Args:
+        bounds (dict): {"_southWest": {"lat", "lng"}, "_northEast": {"lat", "lng"}}
+            as returned by streamlit-folium
+
+    Returns:
+        tuple or None: Bounding box, or None if the bounds are incomplete
+    """
+    try:
+        south_west, north_east = bounds["_southWest"], bounds["_northEast"]
+        return (
+            float(south_west["lng"]), max(float(south_west["lat"]), -90.0),
+            float(north_east["lng"]), min(float(north_east["lat"]), 90.0)
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
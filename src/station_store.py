@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+from instrumentation import record_cache
+from settings import CACHE_DIR, STATION_CATALOG_TTL
+
+SHARD_DIR = CACHE_DIR / "stations"
+
+# Station properties every catalog has, even when no station could be loaded
+CATALOG_COLUMNS = ["id", "name", "city_name", "country_id", "pollutants"]
+
+
+def _shard_path(country):
+    return SHARD_DIR / f"{country.upper()}.parquet"
+
+
+def _empty_catalog():
+    return gpd.GeoDataFrame({column: pd.Series(dtype=object) for column in CATALOG_COLUMNS}, geometry=gpd.GeoSeries([]))
+
+
+def _restore_list_columns(gdf):
+    """Parquet round-trips list properties (e.g. pollutants) as numpy arrays; turn them back into lists."""
+    for column in gdf.columns:
+        if column == gdf.geometry.name or gdf[column].dtype != object:
+            continue
+        if gdf[column].map(lambda v: isinstance(v, np.ndarray)).any():
+            gdf[column] = gdf[column].map(lambda v: v.tolist() if isinstance(v, np.ndarray) else v)
+    return gdf
+
+
+def read_shard(country):
+    """
+    Read the cached station shard for a country.
+
+    Args:
+        country (str): ISO country code
+
+    Returns:
+        tuple: (GeoDataFrame or None, age of the shard in seconds or None)
+    """
+    path = _shard_path(country)
+    try:
+        age = time.time() - path.stat().st_mtime
+        shard = gpd.read_parquet(path)
+    except (OSError, ValueError):
+        # Missing or unreadable shards are simply refetched
+        return None, None
+    return _restore_list_columns(shard), age
+
+
+def write_shard(country, gdf):
+    """
+    Persist a country's stations as a GeoParquet shard.
+
+    The file is written to a temporary path first and moved into place so
+    concurrent readers never see a partially written shard.
+
+    Args:
+        country (str): ISO country code
+        gdf (geopandas.GeoDataFrame): Stations belonging to the country
+
+    Returns:
+        bool: True if the shard was written
+    """
+    SHARD_DIR.mkdir(parents=True, exist_ok=True)
+    path = _shard_path(country)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        gdf.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    except (OSError, ValueError, TypeError):
+        # Properties with mixed types cannot always be stored; the catalog
+        # still works, it just will not be cached for this country.
+        tmp_path.unlink(missing_ok=True)
+        return False
+    return True
+
+
+def split_by_country(stations_gdf, countries):
+    """
+    Split a fetched catalog into one GeoDataFrame per requested country.
+
+    Countries without any station get an empty shard so they are not
+    refetched on every load.
+    """
+    shards = {}
+    for country in countries:
+        if "country_id" in stations_gdf.columns and not stations_gdf.empty:
+            shard = stations_gdf[stations_gdf["country_id"] == country].reset_index(drop=True)
+        else:
+            shard = _empty_catalog()
+        shards[country] = shard
+    return shards
+
+
+def load_station_catalog(countries, fetch, ttl=STATION_CATALOG_TTL):
+    """
+    Assemble a station catalog from per-country shards.
+
+    Fresh shards are read from disk and only missing or expired countries are
+    fetched through `fetch`. Countries that fail to fetch fall back to their
+    expired shard, if any, rather than returning nothing.
+
+    Args:
+        countries (list): ISO country codes to include
+        fetch (callable): Takes a list of country codes and returns a tuple of
+            (GeoDataFrame of their stations, dict mapping failed country codes
+            to an error message)
+        ttl (int): Maximum shard age in seconds
+
+    Returns:
+        tuple: (geopandas.GeoDataFrame, dict of failed country codes to error messages)
+    """
+    countries = list(dict.fromkeys(c.upper() for c in countries))
+    shards = {}
+    stale = {}
+    missing = []
+
+    for country in countries:
+        shard, age = read_shard(country)
+        if shard is not None and age < ttl:
+            shards[country] = shard
+        else:
+            if shard is not None:
+                stale[country] = shard
+            missing.append(country)
+
+    record_cache("station_shards", hits=len(shards), misses=len(missing))
+    failed = {}
+    if missing:
+        try:
+            fetched, failed = fetch(missing)
+        except Exception as e:
+            fetched, failed = _empty_catalog(), {country: str(e) for country in missing}
+
+        succeeded = [c for c in missing if c not in failed]
+        for country, shard in split_by_country(fetched, succeeded).items():
+            write_shard(country, shard)
+            shards[country] = shard
+        for country in failed:
+            if country in stale:
+                shards[country] = stale[country]
+
+    frames = [shards[c] for c in countries if c in shards and not shards[c].empty]
+    if not frames:
+        return _empty_catalog(), failed
+
+    stations_gdf = gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), geometry="geometry")
+    return stations_gdf, failed
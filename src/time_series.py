@@ -1,11 +1,32 @@
 import pandas as pd
 import plotly.express as px
 import streamlit as st
-import requests
 from datetime import datetime, timedelta
 import random
 import math
 from data_export import add_export_section
+from rollups import ROLLUP_LEVELS
+from running_stats import load_running_stats
+from series_loader import (
+    load_historical_data, load_series, fetch_many_historical, summarize_rollup, stack_series, summarize_aqi
+)
+from instrumentation import span
+from downsample import downsample_series
+from quality import scan_quality
+from pollutant_index import mask_codes
+from settings import PLOT_MAX_POINTS, NEARBY_RADIUS_KM
+
+def generate_mock_data(station_id, pollutant, start_date, end_date):
+    dates = pd.date_range(start=start_date, end=end_date, freq='h')
+    mock_values = [10 + 5 * math.sin(i/24 * math.pi) + random.uniform(-2, 2) for i in range(len(dates))]
+    
+    mock_df = pd.DataFrame({
+        'datetime': dates,
+        'value': mock_values,
+        'pollutant': pollutant,
+        'station_name': f"Station {station_id}"
+    })
+    return mock_df.set_index('datetime')
 
 def fetch_historical_data(station_id, pollutant, days=30):
     """
@@ -19,96 +40,206 @@ def fetch_historical_data(station_id, pollutant, days=30):
     Returns:
         pandas.DataFrame: Time series data with datetime index and pollutant values
     """
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
-    
-    # Format dates for API
-    start_str = start_date.strftime("%Y-%m-%d")
-    end_str = end_date.strftime("%Y-%m-%d")
-    
-    # Try the main API endpoint first
-    base_url = "https://api.energyandcleanair.org/measurements"  # Removed /v1/
-    params = {
-        "station_id": station_id,
-        "pollutant": pollutant,
-        "start_date": start_str,
-        "end_date": end_str,
-        "format": "json",  # Added format parameter
-        "limit": 1000
-    }
+    df, errors = load_historical_data(station_id, pollutant, days)
     
-    try:
-        st.info(f"Fetching data from {base_url} with parameters: {params}")
-        response = requests.get(base_url, params=params, timeout=15)
-        
-        # Debug information
-        st.info(f"Response status code: {response.status_code}")
+    if errors:
+        st.error(f"Error fetching historical data: {errors[0]}")
         
-        if response.status_code != 200:
-            # Try alternative endpoint format
-            alt_base_url = f"https://api.energyandcleanair.org/stations/{station_id}/measurements"
-            alt_params = {
-                "pollutant": pollutant,
-                "start_date": start_str,
-                "end_date": end_str,
-                "format": "json",
-                "limit": 1000
-            }
-            
-            st.info(f"Trying alternative endpoint: {alt_base_url}")
-            response = requests.get(alt_base_url, params=alt_params, timeout=15)
-            st.info(f"Alternative response status code: {response.status_code}")
+        if not df.empty:
+            st.warning("Some date ranges could not be fetched; showing the data that is available.")
+        else:
+            # For development/testing: create mock data
+            st.info("Generating mock data for demonstration purposes")
+            end_date = datetime.now()
+            return generate_mock_data(station_id, pollutant, end_date - timedelta(days=days), end_date)
+    
+    return df
+
+def fetch_series(station_id, pollutant, station_name, days=30):
+    """
+    Fetch a series for display, at the coarsest rollup level that fills the chart.
+    
+    Args:
+        station_id (str): The ID of the monitoring station
+        pollutant (str): The pollutant code (pm10, pm25, etc.)
+        station_name (str): Display name of the station
+        days (int): Number of days of historical data to fetch
         
-        response.raise_for_status()
-        data = response.json()
+    Returns:
+        tuple: (pandas.DataFrame with value, min, max, count, pollutant and station_name columns, level used)
+    """
+    df, level, errors = load_series(station_id, pollutant, days)
+    
+    if errors:
+        st.error(f"Error fetching historical data: {errors[0]}")
         
-        # Convert to DataFrame
-        if "results" in data and len(data["results"]) > 0:
-            df = pd.DataFrame(data["results"])
-            df["datetime"] = pd.to_datetime(df["datetime"])
-            df = df.set_index("datetime")
-            return df
-        elif isinstance(data, list) and len(data) > 0:
-            # Handle case where API returns a list directly
-            df = pd.DataFrame(data)
-            if "date" in df.columns:
-                df["datetime"] = pd.to_datetime(df["date"])
-            elif "timestamp" in df.columns:
-                df["datetime"] = pd.to_datetime(df["timestamp"])
-            else:
-                st.warning("Could not find date column in response")
-                return pd.DataFrame()
-                
-            df = df.set_index("datetime")
-            return df
+        if not df.empty:
+            st.warning("Some date ranges could not be fetched; showing the data that is available.")
         else:
-            st.warning(f"API returned empty or unexpected data structure: {data}")
-            return pd.DataFrame()
-            
-    except Exception as e:
-        st.error(f"Error fetching historical data: {e}")
+            # For development/testing: create mock data
+            st.info("Generating mock data for demonstration purposes")
+            end_date = datetime.now()
+            return generate_mock_data(station_id, pollutant, end_date - timedelta(days=days), end_date), "hourly"
+    
+    return df.assign(pollutant=pollutant, station_name=station_name), level
+
+def align_series(frames, labels, freq="1h"):
+    """
+    Resample series onto a common time index as columns of one wide frame.
+    
+    Args:
+        frames (dict): (station_id, pollutant) to DataFrame with a value column
+        labels (dict): (station_id, pollutant) to station display name
+        freq (str): Pandas offset alias for the shared resampling interval
         
-        # For development/testing: create mock data
-        st.info("Generating mock data for demonstration purposes")
-        dates = pd.date_range(start=start_date, end=end_date, freq='H')
-        mock_values = [10 + 5 * math.sin(i/24 * math.pi) + random.uniform(-2, 2) for i in range(len(dates))]
+    Returns:
+        pandas.DataFrame: Datetime index, (station, pollutant) MultiIndex columns
+    """
+    resampled = {
+        (labels[key], key[1]): df["value"].resample(freq).mean()
+        for key, df in frames.items()
+        if not df.empty and "value" in df.columns
+    }
+    if not resampled:
+        return pd.DataFrame()
+    
+    wide = pd.concat(resampled, axis=1)
+    wide.columns = wide.columns.set_names(["station", "pollutant"])
+    wide.index.name = "datetime"
+    return wide
+
+def add_aqi_section(frames, labels, pollutant_info):
+    """
+    Show AQI and exceedance tables for hourly series.
+    
+    Args:
+        frames (dict): (station_id, pollutant) to hourly DataFrame with a value column
+        labels (dict): (station_id, pollutant) to station display name
+        pollutant_info (dict): Dictionary with pollutant metadata
+    """
+    aqi_summary, exceedances = summarize_aqi(frames, labels)
+    if aqi_summary.empty and exceedances.empty:
+        return
+    
+    st.subheader("Air Quality Index")
+    st.caption(
+        "US EPA AQI from 24h PM, 8h O₃/CO and 1h NO₂/SO₂ averages of the "
+        "selected pollutants; exceedances count hours above WHO 2021 guidelines "
+        "and EPA standards."
+    )
+    if not aqi_summary.empty:
+        aqi_summary["dominant pollutant"] = aqi_summary["dominant pollutant"].map(
+            lambda p: pollutant_info.get(p, {}).get("name", p)
+        )
+        st.dataframe(aqi_summary.style.format({"latest AQI": "{:.0f}", "peak AQI": "{:.0f}"}))
+    if not exceedances.empty:
+        st.dataframe(
+            exceedances.pivot_table(
+                index=["station", "pollutant"],
+                columns="standard",
+                values=["exceedance_hours", "exceedance_days"],
+                aggfunc="sum"
+            ),
+            width="stretch"
+        )
+
+def add_quality_section(frames, labels, days):
+    """
+    Show gap, flatline and spike detection results for hourly series.
+    
+    Args:
+        frames (dict): (station_id, pollutant) to hourly DataFrame with a value column
+        labels (dict): (station_id, pollutant) to station display name
+        days (int): Length of the scanned window in days
+    """
+    measurements = stack_series(frames)
+    end = pd.Timestamp.now(tz="UTC").floor("h")
+    if measurements.empty:
+        return
+    
+    summary, details = scan_quality(measurements, end - pd.Timedelta(days=days), end)
+    summary = summary.reindex(pd.MultiIndex.from_tuples(list(frames), names=summary.index.names)).fillna(
+        {"observed": 0, "completeness": 0.0, "gaps": 0, "longest_gap_hours": 0, "flatline_hours": 0, "spikes": 0}
+    )
+    summary.index = pd.MultiIndex.from_arrays(
+        [[labels[key] for key in summary.index], summary.index.get_level_values("pollutant")],
+        names=["station", "pollutant"]
+    )
+    
+    st.subheader("Data Quality")
+    st.dataframe(summary.drop(columns="expected").style.format({
+        "observed": "{:.0f}", "completeness": "{:.0%}"
+    }), width="stretch")
+    names = {station_id: label for (station_id, _), label in labels.items()}
+    with st.expander("Detected gaps, flatlines and spikes"):
+        for name, detail in details.items():
+            st.markdown(f"**{name.capitalize()}** ({len(detail)})")
+            if not detail.empty:
+                detail.insert(0, "station", detail.pop("station_id").map(names))
+                st.dataframe(detail, width="stretch", hide_index=True)
+
+def summarize_series(wide):
+    """
+    Compute summary statistics for every column of a wide frame in one pass.
+    
+    Args:
+        wide (pandas.DataFrame): Output of `align_series`
         
-        mock_df = pd.DataFrame({
-            'datetime': dates,
-            'value': mock_values,
-            'pollutant': pollutant,
-            'station_name': f"Station {station_id}"
-        })
-        mock_df = mock_df.set_index('datetime')
-        return mock_df
+    Returns:
+        pandas.DataFrame: One row per series with mean, max, min, std, count and completeness
+    """
+    stats = wide.agg(["mean", "max", "min", "std", "count"]).T
+    stats["completeness"] = stats["count"] / len(wide) if len(wide) else 0.0
+    return stats
 
-def plot_time_series(df, pollutant_info):
+def plot_comparison(wide, pollutant_info, max_points=PLOT_MAX_POINTS):
+    """
+    Plot aligned series together, one row per pollutant with a shared time axis.
+    
+    Args:
+        wide (pandas.DataFrame): Output of `align_series`
+        pollutant_info (dict): Dictionary with pollutant metadata
+        max_points (int): Maximum number of plotted points per series
+        
+    Returns:
+        plotly.graph_objects.Figure: Interactive comparison plot
+    """
+    long_df = pd.concat([
+        downsample_series(wide[column], max_points).rename("value").to_frame()
+        .assign(station=column[0], pollutant=column[1])
+        for column in wide.columns
+    ]).reset_index()
+    long_df["pollutant"] = long_df["pollutant"].map(
+        lambda p: f"{pollutant_info.get(p, {}).get('name', p.upper())} ({pollutant_info.get(p, {}).get('unit', '')})"
+    )
+    fig = px.line(
+        long_df,
+        x="datetime",
+        y="value",
+        color="station",
+        facet_row="pollutant",
+        title="Station Comparison",
+        labels={"value": "Concentration", "datetime": "Date"},
+        height=max(400, 300 * long_df["pollutant"].nunique())
+    )
+    # Each pollutant keeps its own concentration scale; time stays shared
+    fig.update_yaxes(matches=None)
+    fig.for_each_annotation(lambda a: a.update(text=a.text.split("=", 1)[-1]))
+    return fig
+
+def plot_time_series(df, pollutant_info, max_points=PLOT_MAX_POINTS, level="hourly"):
     """
     Create a time series plot for pollutant data.
     
+    Series longer than `max_points` are downsampled with LTTB for display,
+    which keeps peaks visible while bounding the figure size. Rollups coarser
+    than hourly also show the min-max range of each bucket.
+    
     Args:
         df (pandas.DataFrame): DataFrame with datetime index and pollutant values
         pollutant_info (dict): Dictionary with pollutant metadata
+        max_points (int): Maximum number of plotted points per line
+        level (str): Rollup level of `df`, key of ROLLUP_LEVELS
         
     Returns:
         plotly.graph_objects.Figure: Interactive time series plot
@@ -125,52 +256,196 @@ def plot_time_series(df, pollutant_info):
     p_unit = pollutant_info.get(pollutant, {}).get("unit", "")
     p_color = pollutant_info.get(pollutant, {}).get("color", "blue")
     
+    # Rolling average on the full-resolution series, without copying the frame
+    rolling_window, rolling_label = ROLLUP_LEVELS[level]["rolling"]
+    rolling_avg = df["value"].rolling(window=rolling_window).mean()
+    
+    # Only the plotted points are downsampled
+    values = downsample_series(df["value"], max_points)
+    rolling_values = downsample_series(rolling_avg, max_points)
+    
     # Create plot
     fig = px.line(
-        df, 
-        y="value",
+        x=values.index,
+        y=values.to_numpy(),
         title=f"{p_name} Levels at {station_name}",
-        labels={"value": f"Concentration ({p_unit})", "datetime": "Date"},
+        labels={"y": f"Concentration ({p_unit})", "x": "Date"},
         color_discrete_sequence=[p_color]
     )
     
-    # Add rolling average
-    df_rolling = df.copy()
-    df_rolling["24h_avg"] = df["value"].rolling(window=24).mean()
-    
     fig.add_scatter(
-        x=df_rolling.index, 
-        y=df_rolling["24h_avg"],
+        x=rolling_values.index, 
+        y=rolling_values.to_numpy(),
         mode="lines",
-        name="24-hour Moving Average",
+        name=rolling_label,
         line=dict(width=2, dash="dash")
     )
     
+    if level != "hourly" and {"min", "max"}.issubset(df.columns):
+        fig.add_scatter(
+            x=df.index, y=df["max"], mode="lines", line=dict(width=0),
+            name=f"{level.capitalize()} Range", legendgroup="range", showlegend=False
+        )
+        fig.add_scatter(
+            x=df.index, y=df["min"], mode="lines", line=dict(width=0),
+            fill="tonexty", fillcolor="rgba(128, 128, 128, 0.2)",
+            name=f"{level.capitalize()} Range", legendgroup="range"
+        )
+    
     return fig
 
-def add_time_series_section(stations_gdf, pollutant_info):
+def add_comparison_section(station_options, pollutant_info):
+    """
+    Add the multi-station / multi-pollutant comparison view.
+    
+    Args:
+        station_options (list): Station dicts with id, name and pollutants
+        pollutant_info (dict): Dictionary with pollutant metadata
+    """
+    selected_stations = st.multiselect(
+        "Select stations to compare:",
+        options=station_options,
+        default=station_options[:2],
+        format_func=lambda x: x["name"]
+    )
+    
+    available_pollutants = [
+        p for p in pollutant_info
+        if any(p in station["pollutants"] for station in selected_stations)
+    ]
+    selected_pollutants = st.multiselect(
+        "Select pollutants to compare:",
+        options=available_pollutants,
+        default=available_pollutants[:1],
+        format_func=lambda p: pollutant_info[p]["name"]
+    )
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        time_range = st.slider(
+            "Select time range (days):",
+            min_value=7,
+            max_value=730,
+            value=30,
+            step=1,
+            key="comparison_time_range"
+        )
+    with col2:
+        resample_freq = st.selectbox(
+            "Align series to:",
+            options=["1h", "6h", "1D", "1W"],
+            index=0,
+            format_func=lambda f: {"1h": "Hourly", "6h": "6-hourly", "1D": "Daily", "1W": "Weekly"}[f]
+        )
+    
+    series = [
+        (station["id"], p)
+        for station in selected_stations
+        for p in selected_pollutants
+        if p in station["pollutants"]
+    ]
+    if not series:
+        st.info("Select at least one station and a pollutant it measures.")
+        return
+    
+    with st.spinner(f"Fetching {len(series)} series..."), span("fetch_series", series=len(series), days=time_range):
+        frames, errors = fetch_many_historical(
+            series,
+            days=time_range,
+            level={"1h": "hourly", "6h": "hourly", "1D": "daily", "1W": "weekly"}[resample_freq]
+        )
+    
+    for (station_id, pollutant), error in errors.items():
+        st.warning(f"Could not fully load {pollutant} for station {station_id}: {error}")
+    
+    labels = {}
+    for station in selected_stations:
+        label = station["name"]
+        if label in labels.values():
+            label = f"{label} [{station['id']}]"
+        labels.update({(station["id"], p): label for p in selected_pollutants})
+    
+    wide = align_series(frames, labels, freq=resample_freq)
+    if wide.empty:
+        st.warning("No data available for the selected parameters.")
+        return
+    
+    with span("comparison_chart"):
+        st.plotly_chart(plot_comparison(wide, pollutant_info), width="stretch")
+    
+    st.subheader("Statistical Summary")
+    st.dataframe(summarize_series(wide).style.format({
+        "mean": "{:.2f}", "max": "{:.2f}", "min": "{:.2f}", "std": "{:.2f}",
+        "count": "{:.0f}", "completeness": "{:.0%}"
+    }))
+    
+    if resample_freq in ("1h", "6h"):
+        with span("aqi"):
+            add_aqi_section(frames, labels, pollutant_info)
+        with span("quality"):
+            add_quality_section(frames, labels, time_range)
+    else:
+        st.caption("AQI, exceedances and data quality are computed on hourly alignment.")
+    
+    flat = wide.copy(deep=False)
+    flat.columns = [f"{station} - {pollutant}" for station, pollutant in wide.columns]
+    add_export_section(flat, section_name="timeseries_comparison")
+
+def add_time_series_section(stations_gdf, pollutant_info, station_index=None):
     """
     Add time series analysis section to the dashboard.
     
     Args:
         stations_gdf (geopandas.GeoDataFrame): GeoDataFrame with station data
         pollutant_info (dict): Dictionary with pollutant metadata
+        station_index (spatial_index.StationIndex): Index over `stations_gdf`,
+            used to offer the stations near the location clicked on the map
     """
     st.header("📈 Time Series Analysis")
     
-    # Station selection
-    station_options = []
-    for _, row in stations_gdf.iterrows():
-        if row["name"] and row["id"]:
-            station_options.append({
-                "id": row["id"],
-                "name": f"{row['name']} ({row['city_name'] if row['city_name'] else 'Unknown City'}, {row['country_id']})"
-            })
+    # Station selection, optionally narrowed to the stations around the
+    # location last clicked on the interactive map (nearest first)
+    candidates = stations_gdf
+    clicked = st.session_state.get("map_clicked")
+    if station_index is not None and clicked:
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            near_click = st.checkbox(
+                f"Only stations near the clicked map location ({clicked[0]:.3f}, {clicked[1]:.3f})",
+                value=True
+            )
+        with col2:
+            radius_km = st.number_input("Radius (km):", min_value=1, max_value=500, value=int(NEARBY_RADIUS_KM))
+        if near_click:
+            positions, _ = station_index.within_radius(clicked[0], clicked[1], radius_km)
+            candidates = stations_gdf.iloc[positions]
+    
+    codes = list(pollutant_info.keys())
+    named = candidates[(
+        candidates["name"].notna() & (candidates["name"].astype(str) != "")
+        & candidates["id"].notna() & (candidates["id"].astype(str) != "")
+    ).to_numpy()]
+    cities = named["city_name"].astype(object).where(named["city_name"].notna(), "Unknown City")
+    station_options = [
+        {"id": station_id, "name": f"{name} ({city}, {country})", "pollutants": mask_codes(mask, codes)}
+        for station_id, name, city, country, mask in zip(
+            named["id"], named["name"], cities, named["country_id"], named["pollutant_mask"]
+        )
+    ]
     
     if not station_options:
         st.warning("No stations available for time series analysis.")
         return
     
+    mode = st.radio(
+        "Analysis mode:",
+        options=["Single station", "Compare stations"],
+        horizontal=True
+    )
+    if mode == "Compare stations":
+        add_comparison_section(station_options, pollutant_info)
+        return
+    
     selected_station = st.selectbox(
         "Select a monitoring station:",
         options=station_options,
@@ -178,8 +453,7 @@ def add_time_series_section(stations_gdf, pollutant_info):
     )
     
     # Pollutant selection
-    station_row = stations_gdf[stations_gdf["id"] == selected_station["id"]].iloc[0]
-    available_pollutants = station_row["pollutants"] if isinstance(station_row["pollutants"], list) else []
+    available_pollutants = selected_station["pollutants"]
     
     if not available_pollutants:
         st.warning("No pollutant data available for the selected station.")
@@ -191,51 +465,79 @@ def add_time_series_section(stations_gdf, pollutant_info):
         format_func=lambda p: pollutant_info[p]["name"]
     )
     
-    # Time range selection
+    # Time range selection; long windows are served from the weekly and monthly rollups
     time_range = st.slider(
         "Select time range (days):",
         min_value=7,
-        max_value=90,
+        max_value=3650,
         value=30,
         step=1
     )
     
     # Fetch and display data
-    with st.spinner("Fetching historical data..."):
-        df = fetch_historical_data(
+    with st.spinner("Fetching historical data..."), span("fetch_series", series=1, days=time_range):
+        df, level = fetch_series(
             selected_station["id"],
             selected_pollutant,
+            selected_station["name"],
             days=time_range
         )
     
     if not df.empty:
-        fig = plot_time_series(df, pollutant_info)
+        with span("time_series_chart", points=len(df)):
+            fig = plot_time_series(df, pollutant_info, level=level)
+            if fig:
+                st.plotly_chart(fig, width="stretch")
         if fig:
-            st.plotly_chart(fig, use_container_width=True)
+            if level != "hourly":
+                st.caption(f"Showing {level} aggregates for a {time_range}-day window.")
             
             # Add export functionality for time series data
             add_export_section(df, section_name=f"timeseries_{selected_pollutant}")
             
             # Basic statistics
             st.subheader("Statistical Summary")
+            stats = summarize_rollup(df)
             col1, col2, col3 = st.columns(3)
             
             with col1:
                 st.metric(
                     "Average", 
-                    f"{df['value'].mean():.2f} {pollutant_info[selected_pollutant]['unit']}"
+                    f"{stats['mean']:.2f} {pollutant_info[selected_pollutant]['unit']}"
                 )
             
             with col2:
                 st.metric(
                     "Maximum", 
-                    f"{df['value'].max():.2f} {pollutant_info[selected_pollutant]['unit']}"
+                    f"{stats['max']:.2f} {pollutant_info[selected_pollutant]['unit']}"
                 )
                 
             with col3:
                 st.metric(
                     "Minimum", 
-                    f"{df['value'].min():.2f} {pollutant_info[selected_pollutant]['unit']}"
+                    f"{stats['min']:.2f} {pollutant_info[selected_pollutant]['unit']}"
                 )
+            
+            running = load_running_stats(selected_station["id"], selected_pollutant)
+            if running.count:
+                unit = pollutant_info[selected_pollutant]['unit']
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Latest 24h Average", f"{running.rolling_mean:.2f} {unit}")
+                with col2:
+                    st.metric("Median (all data)", f"{running.quantile(0.5):.2f} {unit}")
+                with col3:
+                    st.metric("95th Percentile (all data)", f"{running.quantile(0.95):.2f} {unit}")
+                st.caption(
+                    f"All-time statistics over {running.count:,} measurements "
+                    f"up to {running.last_update:%Y-%m-%d %H:%M} UTC."
+                )
+            
+            if level == "hourly":
+                key = (selected_station["id"], selected_pollutant)
+                with span("aqi"):
+                    add_aqi_section({key: df}, {key: selected_station["name"]}, pollutant_info)
+                with span("quality"):
+                    add_quality_section({key: df}, {key: selected_station["name"]}, time_range)
     else:
         st.warning("No data available for the selected parameters.")
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# The stores resolve their directories at import time: keep tests away from
+# the real cache
+os.environ["AQ_CACHE_DIR"] = tempfile.mkdtemp(prefix="aq-tests-")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
@@ -0,0 +1,16 @@
+from datetime import date
+
+import pandas as pd
+
+from rollups import ROLLUP_LEVELS, read_rollup, update_rollups
+
+
+def test_empty_ingest_into_new_series():
+    days = [date(2024, 1, 1), date(2024, 1, 2)]
+    update_rollups("empty-station", "pm10", pd.DataFrame(), days)
+
+    assert read_rollup("empty-station", "pm10", "hourly").empty
+    daily = read_rollup("empty-station", "pm10", "daily")
+    assert list(daily["count"]) == [0, 0]
+    for level in ROLLUP_LEVELS:
+        assert list(read_rollup("empty-station", "pm10", level).columns) == ["value", "min", "max", "count"]
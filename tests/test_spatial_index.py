@@ -0,0 +1,41 @@
+import geopandas as gpd
+import numpy as np
+import pytest
+
+from spatial_index import StationIndex, haversine_km
+
+
+@pytest.fixture(scope="module")
+def stations():
+    rng = np.random.default_rng(0)
+    lons = rng.uniform(-180, 180, 100_000)
+    # Uniform over the sphere, so high latitudes are covered too
+    lats = np.degrees(np.arcsin(rng.uniform(-1, 1, 100_000)))
+    gdf = gpd.GeoDataFrame(geometry=gpd.points_from_xy(lons, lats), crs="EPSG:4326")
+    return StationIndex(gdf), lats, lons
+
+
+@pytest.mark.parametrize("lat,lon,radius_km", [
+    (38, 20, 2517),
+    (60, 179, 500),
+    (75, -60, 500),
+    (-82, 10, 500),
+    (0, -179.5, 1500),
+    (45, 0, 8000),
+])
+def test_within_radius_matches_brute_force(stations, lat, lon, radius_km):
+    index, lats, lons = stations
+    positions, distances = index.within_radius(lat, lon, radius_km)
+
+    expected = np.flatnonzero(haversine_km(lat, lon, lats, lons) <= radius_km)
+    np.testing.assert_array_equal(np.sort(positions), expected)
+    assert np.all(np.diff(distances) >= 0)
+
+
+def test_within_radius_random_queries(stations):
+    index, lats, lons = stations
+    rng = np.random.default_rng(1)
+    for lat, lon in zip(rng.uniform(-89, 89, 200), rng.uniform(-180, 180, 200)):
+        positions, _ = index.within_radius(lat, lon, 500)
+        expected = np.flatnonzero(haversine_km(lat, lon, lats, lons) <= 500)
+        np.testing.assert_array_equal(np.sort(positions), expected)
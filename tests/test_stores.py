@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+from measurement_store import partition_dir, read_days, write_days
+from station_store import read_shard, write_shard
+
+
+def test_concurrent_day_writes():
+    day = date(2024, 1, 1)
+    index = pd.date_range("2024-01-01", periods=24, freq="h", tz="UTC", name="datetime")
+    df = pd.DataFrame({"value": np.arange(24.0)}, index=index)
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lambda _: write_days("threaded", "pm10", df, [day]), range(64)))
+
+    cached, missing = read_days("threaded", "pm10", [day])
+    assert missing == []
+    assert len(cached) == 24
+    assert not list(partition_dir("threaded", "pm10").glob("*.tmp"))
+
+
+def test_concurrent_shard_writes():
+    gdf = gpd.GeoDataFrame(
+        {"id": [str(i) for i in range(1000)], "country_id": "XX"},
+        geometry=gpd.points_from_xy(np.arange(1000) % 180, np.zeros(1000))
+    )
+
+    with ThreadPoolExecutor(8) as executor:
+        written = list(executor.map(lambda _: write_shard("XX", gdf), range(64)))
+
+    assert all(written)
+    shard, _ = read_shard("XX")
+    assert len(shard) == 1000